@@ -73,6 +73,18 @@ class TestCommonAdapter(test.TestCase):
         vnx_common.client.vnx.get_pool.assert_called_with(
             name=expected_pool)
 
+    @res_mock.mock_driver_input
+    @res_mock.patch_common_adapter
+    def test_create_volume_from_warm_lun(self, vnx_common, _ignore,
+                                         mocked_input):
+        volume = mocked_input['volume']
+        warm_lun = mock.Mock(lun_id=12)
+        vnx_common.warm_lun_pool = mock.Mock()
+        vnx_common.warm_lun_pool.claim.return_value = warm_lun
+        model_update = vnx_common.create_volume(volume)
+        self.assertIn('^12', model_update['provider_location'])
+        vnx_common.client.vnx.get_pool.assert_not_called()
+
     @res_mock.mock_driver_input
     @res_mock.patch_common_adapter
     def test_migrate_volume(self, vnx_common, mocked, cinder_input):
@@ -110,6 +122,35 @@ class TestCommonAdapter(test.TestCase):
         model_update = vnx_common.create_cloned_volume(volume, src_vref)
         self.assertEqual('False', model_update['metadata']['snapcopy'])
 
+    @res_mock.mock_driver_input
+    @res_mock.patch_common_adapter
+    def test_create_cloned_volumes(self, vnx_common, mocked, cinder_input):
+        volume = cinder_input['volume']
+        src_vref = cinder_input['src_vref']
+        vnx_common.serial_number = 'fake_serial'
+        with mock.patch.object(adapter.emc_taskflow, 'create_cloned_volumes',
+                               return_value=([5], {})) as mock_clone:
+            updates = vnx_common.create_cloned_volumes([volume], src_vref)
+        self.assertEqual(1, len(updates))
+        self.assertEqual(volume.id, updates[0]['id'])
+        self.assertIn('^5', updates[0]['provider_location'])
+        self.assertEqual('False', updates[0]['metadata']['snapcopy'])
+        clone_specs = mock_clone.call_args[1]['clone_specs']
+        self.assertEqual([volume.name],
+                         [spec['lun_name'] for spec in clone_specs])
+
+    @res_mock.mock_driver_input
+    @res_mock.patch_common_adapter
+    def test_create_cloned_volumes_error(self, vnx_common, mocked,
+                                         cinder_input):
+        volume = cinder_input['volume']
+        src_vref = cinder_input['src_vref']
+        with mock.patch.object(adapter.emc_taskflow, 'create_cloned_volumes',
+                               return_value=([None],
+                                             {0: OSError('failed')})):
+            updates = vnx_common.create_cloned_volumes([volume], src_vref)
+        self.assertEqual([{'id': volume.id, 'status': 'error'}], updates)
+
     @res_mock.mock_driver_input
     @res_mock.patch_common_adapter
     def test_create_cloned_volume_snapcopy(
@@ -0,0 +1,126 @@
+# Copyright (c) 2016 EMC Corporation, Inc.
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import collections
+
+import mock
+
+from cinder import test
+from cinder.tests.unit.volume.drivers.emc.vnx import fake_exception \
+    as storops_ex
+from cinder.tests.unit.volume.drivers.emc.vnx import test_router
+from cinder.tests.unit.volume.drivers.emc.vnx import utils
+from cinder.volume.drivers.emc.vnx import breaker
+from cinder.volume.drivers.emc.vnx import client as vnx_client
+from cinder.volume.drivers.emc.vnx import proxy
+from cinder.volume.drivers.emc.vnx import router
+
+
+patch_looping_call = mock.patch(
+    'oslo_service.loopingcall.FixedIntervalLoopingCall')
+
+
+class TestCircuitBreaker(test.TestCase):
+    def setUp(self):
+        super(TestCircuitBreaker, self).setUp()
+        self.probe = mock.Mock()
+        self.breaker = breaker.CircuitBreaker('spa', self.probe, 2, 30)
+
+    @patch_looping_call
+    def test_open_after_consecutive_failures(self, mock_loop):
+        self.breaker.record_failure()
+        self.breaker.record_success()
+        self.breaker.record_failure()
+        self.assertFalse(self.breaker.is_open)
+        self.breaker.record_failure()
+        self.assertTrue(self.breaker.is_open)
+        self.assertEqual(1, self.breaker.trips)
+        mock_loop.return_value.start.assert_called_once_with(
+            interval=30, initial_delay=30)
+
+    @patch_looping_call
+    def test_probe_closes(self, mock_loop):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        probe = mock_loop.call_args[0][0]
+        self.probe.side_effect = OSError('unreachable')
+        probe()
+        self.assertTrue(self.breaker.is_open)
+        self.probe.side_effect = None
+        self.assertRaises(breaker.loopingcall.LoopingCallDone, probe)
+        self.assertFalse(self.breaker.is_open)
+        self.assertEqual({'state': 'closed', 'failures': 0, 'trips': 1,
+                          'opened_at': None}, self.breaker.to_dict())
+
+    def test_sp_failure(self):
+        self.assertTrue(breaker.is_sp_failure(OSError()))
+        self.assertFalse(breaker.is_sp_failure(
+            storops_ex.VNXLunNotFoundError()))
+
+
+class TestBreakerBoard(test.TestCase):
+    def setUp(self):
+        super(TestBreakerBoard, self).setUp()
+        self.breakers = {
+            sp: breaker.CircuitBreaker(sp, mock.Mock(), 1, 30)
+            for sp in ('spa', 'spb')}
+        self.board = breaker.BreakerBoard(self.breakers)
+
+    def _build_router(self, spa, spb):
+        tracker = router.LatencyTracker()
+        chain = proxy.InterceptorChain([tracker, self.board])
+        return router.SPRouter(
+            collections.OrderedDict([('spa', spa), ('spb', spb)]),
+            chain, tracker, board=self.board)
+
+    @patch_looping_call
+    def test_available(self, mock_loop):
+        self.assertEqual(['spa', 'spb'], self.board.available(['spa', 'spb']))
+        self.breakers['spa'].record_failure()
+        self.assertEqual(['spb'], self.board.available(['spa', 'spb']))
+        self.breakers['spb'].record_failure()
+        self.assertEqual(['spa', 'spb'], self.board.available(['spa', 'spb']))
+
+    @patch_looping_call
+    def test_calls_skip_open_sp(self, mock_loop):
+        spa = test_router.SPSystem('spa', error=OSError('unreachable'))
+        spb = test_router.SPSystem('spb')
+        vnx = self._build_router(spa, spb)
+        self.assertRaises(OSError, vnx.get_lun, 'lun1')
+        self.assertTrue(self.breakers['spa'].is_open)
+        vnx.get_lun('lun2')
+        vnx.create_lun('lun3')
+        self.assertEqual([('get_lun', 'lun1')], spa.calls)
+        self.assertEqual([('get_lun', 'lun2'), ('create_lun', 'lun3')],
+                         spb.calls)
+
+    def test_semantic_error_keeps_closed(self):
+        spa = test_router.SPSystem(
+            'spa', error=storops_ex.VNXLunNotFoundError('not found'))
+        vnx = self._build_router(spa, test_router.SPSystem('spb'))
+        self.assertRaises(storops_ex.VNXLunNotFoundError,
+                          vnx.get_lun, 'lun1')
+        self.assertFalse(self.breakers['spa'].is_open)
+
+
+class TestClientBreakers(test.TestCase):
+    def test_sp_stats(self):
+        with utils.patch_vnxsystem:
+            client = vnx_client.Client('192.168.1.2', 'sysadmin', 'sysadmin',
+                                       'global', None, None,
+                                       secondary_sp_ip='192.168.1.3')
+        stats = client.get_sp_stats()
+        self.assertEqual('closed', stats['192.168.1.2']['breaker']['state'])
+        self.assertEqual('closed', stats['192.168.1.3']['breaker']['state'])
@@ -0,0 +1,121 @@
+# Copyright (c) 2016 EMC Corporation, Inc.
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+"""Guards the light import path of the VNX driver.
+
+The imports run in a fresh interpreter, because the test package replaces
+storops in `sys.modules`. Run this module directly to benchmark the import
+time of the driver modules:
+
+    python -m cinder.tests.unit.volume.drivers.emc.vnx.test_lazy_import
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+from cinder import test
+from cinder.volume.drivers.emc.vnx import lazy
+
+VNX_PACKAGE = 'cinder.volume.drivers.emc.vnx'
+
+HEAVY_MODULES = ('storops', 'taskflow')
+
+_IMPORT_SCRIPT = """
+import json
+import sys
+import time
+
+attempted = []
+
+
+class Recorder(object):
+    def find_module(self, fullname, path=None):
+        attempted.append(fullname)
+
+    def find_spec(self, fullname, path, target=None):
+        attempted.append(fullname)
+
+
+sys.meta_path.insert(0, Recorder())
+start = time.time()
+for name in sys.argv[1:]:
+    __import__(name)
+elapsed = time.time() - start
+print(json.dumps({'elapsed': elapsed, 'attempted': attempted}))
+"""
+
+
+def import_in_subprocess(*modules):
+    """Imports `modules` in a fresh interpreter.
+
+    Returns the import time in seconds and the names of all the modules
+    whose import was attempted.
+    """
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    output = subprocess.check_output(
+        [sys.executable, '-c', _IMPORT_SCRIPT] + list(modules), env=env)
+    result = json.loads(output.decode('utf-8').strip().splitlines()[-1])
+    return result['elapsed'], result['attempted']
+
+
+def _heavy(attempted):
+    return sorted(set(name for name in attempted
+                      if name.split('.')[0] in HEAVY_MODULES or
+                      name in ('%s.adapter' % VNX_PACKAGE,
+                               '%s.client' % VNX_PACKAGE,
+                               '%s.taskflows' % VNX_PACKAGE)))
+
+
+class TestLazyImport(test.TestCase):
+    def test_driver_import_is_light(self):
+        elapsed, attempted = import_in_subprocess('%s.driver' % VNX_PACKAGE)
+        self.assertEqual([], _heavy(attempted))
+
+    def test_options_import_is_light(self):
+        elapsed, attempted = import_in_subprocess('%s.common' % VNX_PACKAGE)
+        self.assertEqual([], _heavy(attempted))
+
+
+class TestLazyModule(test.TestCase):
+    def test_load_on_access(self):
+        module = lazy.LazyModule('json')
+        self.assertFalse(module._loaded)
+        self.assertEqual('[]', module.dumps([]))
+        self.assertTrue(module._loaded)
+
+    def test_optional_missing(self):
+        module = lazy.try_import('vnx_no_such_module')
+        self.assertFalse(module)
+        self.assertRaises(AttributeError, getattr, module, 'anything')
+
+    def test_required_missing(self):
+        module = lazy.LazyModule('vnx_no_such_module')
+        self.assertRaises(ImportError, getattr, module, 'anything')
+
+
+def benchmark(repeat=5):
+    light = '%s.driver' % VNX_PACKAGE
+    full = '%s.adapter' % VNX_PACKAGE
+    for label, modules in (('driver (lazy)', [light]),
+                           ('driver + adapter', [light, full])):
+        timings = sorted(import_in_subprocess(*modules)[0]
+                         for __ in range(repeat))
+        print('%-20s best %.3fs  median %.3fs' % (
+            label, timings[0], timings[len(timings) // 2]))
+
+
+if __name__ == '__main__':
+    benchmark()
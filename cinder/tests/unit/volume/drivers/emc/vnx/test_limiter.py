@@ -0,0 +1,115 @@
+# Copyright (c) 2016 EMC Corporation, Inc.
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import threading
+
+from cinder import test
+from cinder.tests.unit.volume.drivers.emc.vnx import test_proxy
+from cinder.tests.unit.volume.drivers.emc.vnx import utils
+from cinder.volume.drivers.emc.vnx import client as vnx_client
+from cinder.volume.drivers.emc.vnx import limiter
+from cinder.volume.drivers.emc.vnx import proxy
+
+
+class TestAdmissionController(test.TestCase):
+    def setUp(self):
+        super(TestAdmissionController, self).setUp()
+        self.admission = limiter.AdmissionController(
+            1, lambda call: 'spa')
+
+    def _queue(self, lane, order):
+        def _run():
+            self.admission.acquire('spa', lane)
+            order.append(lane)
+            self.admission.release('spa')
+        thread = threading.Thread(target=_run)
+        thread.start()
+        return thread
+
+    def _wait_queued(self, count):
+        while (sum(lane['queued'] for lane in
+                   self.admission.get_stats()['spa']['lanes'].values()) <
+               count):
+            threading.Event().wait(0.01)
+
+    def test_admit_without_wait(self):
+        self.assertEqual(0.0, self.admission.acquire('spa',
+                                                     limiter.LANE_READ))
+        self.admission.release('spa')
+        stats = self.admission.get_stats()['spa']
+        self.assertEqual(0, stats['inflight'])
+        self.assertEqual(1, stats['lanes']['read']['admitted'])
+        self.assertEqual(0, stats['lanes']['read']['waited'])
+
+    def test_reads_served_first(self):
+        order = []
+        self.admission.acquire('spa', limiter.LANE_WRITE)
+        threads = [self._queue(limiter.LANE_WRITE, order)]
+        self._wait_queued(1)
+        threads.append(self._queue(limiter.LANE_READ, order))
+        self._wait_queued(2)
+        self.admission.release('spa')
+        for thread in threads:
+            thread.join()
+        self.assertEqual(['read', 'write'], order)
+        stats = self.admission.get_stats()['spa']['lanes']
+        self.assertEqual(1, stats['write']['waited'])
+        self.assertEqual(1, stats['read']['waited'])
+
+    def test_writes_not_starved(self):
+        order = []
+        self.admission.acquire('spa', limiter.LANE_READ)
+        threads = [self._queue(limiter.LANE_WRITE, order)]
+        self._wait_queued(1)
+        for i in range(limiter.READ_BURST + 1):
+            threads.append(self._queue(limiter.LANE_READ, order))
+            self._wait_queued(i + 2)
+        self.admission.release('spa')
+        for thread in threads:
+            thread.join()
+        self.assertEqual(limiter.READ_BURST - 1, order.index('write'))
+
+    def test_intercept(self):
+        vnx = proxy.StoropsProxy(test_proxy.FakeSystem(), self.admission)
+        vnx.get_lun('lun1').delete()
+        stats = self.admission.get_stats()['spa']['lanes']
+        self.assertEqual(1, stats['read']['admitted'])
+        self.assertEqual(1, stats['write']['admitted'])
+
+    def test_disabled(self):
+        admission = limiter.AdmissionController(0, lambda call: 'spa')
+        vnx = proxy.StoropsProxy(test_proxy.FakeSystem(), admission)
+        vnx.get_lun('lun1')
+        self.assertEqual({}, admission.get_stats())
+
+
+class TestClientAdmission(test.TestCase):
+    def test_client_admission_stats(self):
+        with utils.patch_vnxsystem:
+            client = vnx_client.Client('192.168.1.2', 'sysadmin', 'sysadmin',
+                                       'global', None, None,
+                                       max_cli_calls_per_sp=2)
+        self.assertEqual({}, client.get_admission_stats())
+        client.admission.acquire(client.ip, limiter.LANE_READ)
+        client.admission.release(client.ip)
+        stats = client.get_admission_stats()
+        self.assertEqual(2, stats['192.168.1.2']['max_inflight'])
+
+    def test_client_without_admission(self):
+        with utils.patch_vnxsystem:
+            client = vnx_client.Client('192.168.1.2', 'sysadmin', 'sysadmin',
+                                       'global', None, None)
+        self.assertIsNone(client.admission)
+        self.assertEqual({}, client.get_admission_stats())
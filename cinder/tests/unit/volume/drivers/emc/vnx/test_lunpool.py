@@ -0,0 +1,152 @@
+# Copyright (c) 2016 EMC Corporation, Inc.
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import mock
+
+from cinder import test
+from cinder.tests.unit.volume.drivers.emc.vnx import fake_storops as storops
+from cinder.volume.drivers.emc.vnx import lunpool
+
+THICK = storops.VNXProvisionEnum.THICK
+THIN = storops.VNXProvisionEnum.THIN
+AUTO = storops.VNXTieringEnum.AUTO
+
+
+class TestWarmName(test.TestCase):
+    def test_round_trip(self):
+        key = lunpool.LunKey('pool1', 10, THIN, AUTO)
+        name = lunpool.build_warm_name(key)
+        self.assertEqual(key, lunpool.parse_warm_name(name, 'pool1'))
+
+    def test_round_trip_without_tier(self):
+        key = lunpool.LunKey('pool1', 1, THICK, None)
+        name = lunpool.build_warm_name(key)
+        self.assertEqual(key, lunpool.parse_warm_name(name, 'pool1'))
+
+    def test_other_luns(self):
+        self.assertIsNone(lunpool.parse_warm_name('volume-1', 'pool1'))
+        self.assertIsNone(lunpool.parse_warm_name('warm-x-thin', 'pool1'))
+
+
+class TestWarmLunPool(test.TestCase):
+    def setUp(self):
+        super(TestWarmLunPool, self).setUp()
+        self.client = mock.Mock()
+        self.client.get_luns.return_value = []
+        self.pool = lunpool.WarmLunPool(self.client, [10, 1], 1, 2)
+        self.pool.add_target('pool1', THICK, None)
+
+    def _warm_names(self, size):
+        return self.pool._luns[lunpool.LunKey('pool1', size, THICK, None)]
+
+    def test_refill_to_high_watermark(self):
+        self.pool.refill()
+        self.assertEqual(4, self.client.create_lun.call_count)
+        self.assertEqual(2, len(self._warm_names(1)))
+        self.assertEqual(2, len(self._warm_names(10)))
+        # Above the low watermark, nothing is created.
+        self._warm_names(1).pop()
+        self.pool.refill()
+        self.assertEqual(4, self.client.create_lun.call_count)
+
+    def test_load_from_array(self):
+        name = lunpool.build_warm_name(
+            lunpool.LunKey('pool1', 10, THICK, None))
+        warm_lun = mock.Mock(pool_name='pool1')
+        warm_lun.name = name
+        other_lun = mock.Mock(pool_name='pool1')
+        other_lun.name = 'volume-1'
+        self.client.get_luns.return_value = [warm_lun, other_lun]
+        self.pool.load()
+        self.assertEqual([name], self._warm_names(10))
+
+    def test_claim_exact_size(self):
+        self.pool.refill()
+        warm_name = self._warm_names(10)[0]
+        lun = self.pool.claim('pool1', 'volume-1', 10, THICK, None)
+        self.assertEqual(self.client.rename_lun.return_value, lun)
+        self.client.rename_lun.assert_called_once_with(warm_name, 'volume-1')
+        self.client.expand_lun.assert_not_called()
+        self.assertEqual(1, self.pool.get_stats()['hits'])
+
+    def test_claim_expands_smaller(self):
+        self.pool.refill()
+        warm_name = self._warm_names(10)[0]
+        self.pool.claim('pool1', 'volume-1', 15, THICK, None)
+        self.client.expand_lun.assert_called_once_with(warm_name, 15)
+        self.client.rename_lun.assert_called_once_with(warm_name, 'volume-1')
+        self.assertEqual(1, self.pool.get_stats()['expanded'])
+
+    def test_claim_miss(self):
+        self.assertIsNone(self.pool.claim('pool1', 'volume-1', 5, THIN,
+                                          None))
+        stats = self.pool.get_stats()
+        self.assertEqual(1, stats['misses'])
+        self.assertEqual(0.0, stats['hit_rate'])
+        # The specs of the miss are kept warm from now on.
+        self.assertIn(lunpool.LunKey('pool1', 1, THIN, None),
+                      self.pool._keys)
+
+    def test_claim_failure_falls_back(self):
+        self.pool.refill()
+        warm_name = self._warm_names(10)[0]
+        self.client.rename_lun.side_effect = OSError('unreachable')
+        self.assertIsNone(self.pool.claim('pool1', 'volume-1', 10, THICK,
+                                          None))
+        self.client.delete_lun.assert_called_once_with(warm_name)
+        self.assertEqual(1, self.pool.get_stats()['misses'])
+
+
+class TestWarmSmpPool(test.TestCase):
+    def setUp(self):
+        super(TestWarmSmpPool, self).setUp()
+        self.client = mock.Mock()
+        self.client.get_luns.return_value = []
+        self.client.get_lun.return_value = mock.Mock(lun_id=3)
+        self.pool = lunpool.WarmSmpPool(self.client, 2, 2)
+
+    def test_hot_base_refilled(self):
+        self.assertIsNone(self.pool.claim('golden', 'smp-1'))
+        self.pool.refill()
+        self.client.create_mount_point.assert_not_called()
+        self.assertIsNone(self.pool.claim('golden', 'smp-2'))
+        self.pool.refill()
+        self.assertEqual(2, self.client.create_mount_point.call_count)
+        warm_name = self.client.create_mount_point.call_args[0][1]
+        self.assertEqual(3, lunpool.parse_warm_smp_name(warm_name))
+
+        lun = self.pool.claim('golden', 'smp-3')
+        self.assertEqual(self.client.rename_lun.return_value, lun)
+        stats = self.pool.get_stats()
+        self.assertEqual(1, stats['hits'])
+        self.assertEqual(2, stats['misses'])
+        self.assertEqual({'golden': 1}, stats['available'])
+
+    def test_load_from_array(self):
+        warm_smp = mock.Mock()
+        warm_smp.name = lunpool.build_warm_smp_name(3)
+        self.client.get_luns.return_value = [warm_smp]
+        self.client.get_lun.return_value.name = 'golden'
+        self.pool.load()
+        self.client.get_lun.assert_called_once_with(lun_id=3)
+        self.assertEqual({'golden': 1}, self.pool.get_stats()['available'])
+
+    def test_release(self):
+        self.pool.claim('golden', 'smp-1')
+        self.pool.claim('golden', 'smp-2')
+        self.pool.refill()
+        self.pool.release('golden')
+        self.assertEqual(2, self.client.delete_lun.call_count)
+        self.assertEqual({}, self.pool.get_stats()['available'])
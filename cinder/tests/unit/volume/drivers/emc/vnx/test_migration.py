@@ -0,0 +1,256 @@
+# Copyright (c) 2016 EMC Corporation, Inc.
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import mock
+
+from cinder import test
+from cinder.tests.unit.volume.drivers.emc.vnx import fake_storops as storops
+from cinder.tests.unit.volume.drivers.emc.vnx import utils
+from cinder.volume.drivers.emc.vnx import client as vnx_client
+from cinder.volume.drivers.emc.vnx import migration
+
+patch_looping_call = mock.patch(
+    'oslo_service.loopingcall.FixedIntervalLoopingCall')
+
+
+def _wait_queued(scheduler, count):
+    for __ in range(500):
+        if scheduler.get_stats()['queued'] == count:
+            return
+        time.sleep(0.01)
+    raise AssertionError('%d migrations are not queued.' % count)
+
+
+class TestMigrationScheduler(test.TestCase):
+    def setUp(self):
+        super(TestMigrationScheduler, self).setUp()
+        self.is_finished = mock.Mock(return_value=False)
+        self.scheduler = migration.MigrationScheduler(1, self.is_finished)
+
+    def _acquire_in_thread(self, src_id, sp, priority, started):
+        def _acquire():
+            self.scheduler.acquire(src_id, sp, priority)
+            started.append(src_id)
+
+        thread = threading.Thread(target=_acquire)
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def test_limit_per_sp(self):
+        self.scheduler.acquire(1, 'SP A')
+        # The other SP has its own slot.
+        self.scheduler.acquire(2, 'SP B')
+        started = []
+        thread = self._acquire_in_thread(3, 'SP A', migration.PRIORITY_SYNC,
+                                         started)
+        _wait_queued(self.scheduler, 1)
+        self.assertEqual([], started)
+        self.scheduler.release(1)
+        thread.join(5)
+        self.assertEqual([3], started)
+        self.assertEqual({'SP A': 1, 'SP B': 1},
+                         self.scheduler.get_stats()['running'])
+
+    def test_sync_first(self):
+        self.scheduler.acquire(1, 'SP A')
+        started = []
+        threads = [
+            self._acquire_in_thread(2, 'SP A', migration.PRIORITY_BACKGROUND,
+                                    started)]
+        _wait_queued(self.scheduler, 1)
+        threads.append(self._acquire_in_thread(
+            3, 'SP A', migration.PRIORITY_SYNC, started))
+        _wait_queued(self.scheduler, 2)
+        self.assertEqual({'sync': 1, 'background': 1},
+                         self.scheduler.get_stats()['queued_by_priority'])
+        self.scheduler.release(1)
+        threads[1].join(5)
+        self.assertEqual([3], started)
+        self.scheduler.release(3)
+        threads[0].join(5)
+        self.assertEqual([3, 2], started)
+
+    @patch_looping_call
+    def test_poll_releases_async(self, mock_loop):
+        self.scheduler.acquire(1, 'SP A', migration.PRIORITY_ASYNC)
+        mock_loop.return_value.start.assert_called_once_with(
+            interval=30, initial_delay=30)
+        self.scheduler.poll()
+        self.assertEqual({'SP A': 1}, self.scheduler.get_stats()['running'])
+        self.is_finished.return_value = True
+        self.assertRaises(migration.loopingcall.LoopingCallDone,
+                          self.scheduler.poll)
+        self.is_finished.assert_called_with(1)
+        self.assertEqual({}, self.scheduler.get_stats()['running'])
+
+    def test_stats(self):
+        self.scheduler.acquire(1, 'SP A')
+        stats = self.scheduler.get_stats()
+        self.assertEqual(1, stats['started'])
+        self.assertEqual(0, stats['queued'])
+        self.assertIsNotNone(stats['max_wait'])
+
+
+class TestClientMigration(test.TestCase):
+    def setUp(self):
+        super(TestClientMigration, self).setUp()
+        with utils.patch_vnxsystem:
+            self.client = vnx_client.Client(
+                '192.168.1.2', 'sysadmin', 'sysadmin', 'global', None, None,
+                max_migrations_per_sp=1)
+        self.client.vnx = mock.Mock()
+        self.client.vnx.get_lun.return_value.current_owner.value = 'SP A'
+
+    def test_migrate_lun_holds_slot(self):
+        self.client.migrate_lun(1, 2)
+        self.assertEqual({'SP A': 1},
+                         self.client.get_migration_stats()['running'])
+
+    def test_migrate_lun_failure_releases_slot(self):
+        self.client.vnx.get_lun.return_value.migrate.side_effect = (
+            OSError('unreachable'))
+        self.assertRaises(OSError, self.client.migrate_lun, 1, 2)
+        self.assertEqual({}, self.client.get_migration_stats()['running'])
+
+    @mock.patch('time.sleep')
+    def test_verify_migration_releases_slot(self, mock_sleep):
+        self.client.migrate_lun(1, 2)
+        with mock.patch.object(self.client, 'session_finished',
+                               return_value=True):
+            self.client.verify_migration(1, 2, 'wwn')
+        self.assertEqual({}, self.client.get_migration_stats()['running'])
+
+
+class TestMigrationRatePolicy(test.TestCase):
+    def setUp(self):
+        super(TestMigrationRatePolicy, self).setUp()
+        self.load = mock.Mock(return_value=0)
+        self.policy = migration.MigrationRatePolicy(
+            10, 1024, off_peak_hours=(22, 6), busy_threshold=4,
+            load=self.load)
+        self.off_peak = mock.patch.object(self.policy, 'is_off_peak',
+                                          return_value=False)
+        self.off_peak.start()
+        self.addCleanup(self.off_peak.stop)
+
+    def test_sync(self):
+        self.assertEqual(storops.VNXMigrationRate.ASAP,
+                         self.policy.select(10, False))
+        self.assertEqual(storops.VNXMigrationRate.HIGH,
+                         self.policy.select(11, False))
+
+    def test_async(self):
+        self.assertEqual(storops.VNXMigrationRate.MEDIUM,
+                         self.policy.select(10, True))
+        self.assertEqual(storops.VNXMigrationRate.LOW,
+                         self.policy.select(2048, True))
+
+    def test_async_off_peak(self):
+        self.policy.is_off_peak.return_value = True
+        self.assertEqual(storops.VNXMigrationRate.HIGH,
+                         self.policy.select(10, True))
+        self.assertEqual(storops.VNXMigrationRate.MEDIUM,
+                         self.policy.select(2048, True))
+
+    def test_async_busy(self):
+        self.load.return_value = 4
+        self.assertEqual(storops.VNXMigrationRate.LOW,
+                         self.policy.select(10, True))
+        self.assertEqual(storops.VNXMigrationRate.LOW,
+                         self.policy.select(2048, True))
+        # Sync migrations are not slowed down.
+        self.assertEqual(storops.VNXMigrationRate.ASAP,
+                         self.policy.select(1, False))
+
+    def test_off_peak_window(self):
+        self.off_peak.stop()
+        self.assertTrue(self.policy.is_off_peak(23))
+        self.assertTrue(self.policy.is_off_peak(5))
+        self.assertFalse(self.policy.is_off_peak(6))
+        self.assertFalse(self.policy.is_off_peak(12))
+        self.off_peak.start()
+
+    def test_parse_hours(self):
+        self.assertEqual((22, 6), migration.parse_hours('22-6'))
+        self.assertRaises(ValueError, migration.parse_hours, '22')
+        self.assertRaises(ValueError, migration.parse_hours, '1-25')
+
+
+def _session(src_id, state='MIGRATING', percent=50):
+    return mock.Mock(source_lu_id=src_id, current_state=state,
+                     percent_complete=percent, time_remaining='1 minute(s)')
+
+
+class TestMigrationTracker(test.TestCase):
+    def setUp(self):
+        super(TestMigrationTracker, self).setUp()
+        self.state_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.state_dir)
+        self.client = mock.Mock()
+        self.client.get_migration_sessions.return_value = []
+        self.loop = patch_looping_call.start()
+        self.addCleanup(patch_looping_call.stop)
+        self.tracker = migration.MigrationTracker(self.client,
+                                                  self.state_dir)
+
+    def test_progress(self):
+        self.tracker.track('vol-1', 1, 'snap-1')
+        self.loop.return_value.start.assert_called_once_with(
+            interval=60, initial_delay=60)
+        self.client.get_migration_sessions.return_value = [_session(1)]
+        self.tracker.poll()
+        progress = self.tracker.get_progress('vol-1')
+        self.assertEqual(50, progress['percent_complete'])
+        self.assertEqual('1 minute(s)', progress['time_remaining'])
+        self.assertEqual(1, self.tracker.get_stats()['tracked'])
+        self.client.delete_snapshot.assert_not_called()
+
+    def test_finished_deletes_snapshot(self):
+        self.tracker.track('vol-1', 1, 'snap-bulk')
+        self.tracker.track('vol-2', 2, 'snap-bulk')
+        self.client.get_migration_sessions.return_value = [_session(2)]
+        self.tracker.poll()
+        # The snapshot is still used by the other migration.
+        self.client.delete_snapshot.assert_not_called()
+        self.client.get_migration_sessions.return_value = []
+        self.assertRaises(migration.loopingcall.LoopingCallDone,
+                          self.tracker.poll)
+        self.client.delete_snapshot.assert_called_once_with('snap-bulk')
+        self.assertEqual(2, self.tracker.get_stats()['completed'])
+
+    def test_faulted(self):
+        self.tracker.track('vol-1', 1, 'snap-1')
+        self.client.get_migration_sessions.return_value = [
+            _session(1, state='FAULTED')]
+        self.assertRaises(migration.loopingcall.LoopingCallDone,
+                          self.tracker.poll)
+        self.client.delete_snapshot.assert_not_called()
+        self.assertEqual(1, self.tracker.get_stats()['faulted'])
+
+    def test_reload(self):
+        self.tracker.track('vol-1', 1, 'snap-1')
+        tracker = migration.MigrationTracker(self.client, self.state_dir)
+        self.assertTrue(tracker.is_tracked('vol-1'))
+        tracker.forget('vol-1')
+        tracker = migration.MigrationTracker(self.client, self.state_dir)
+        self.assertFalse(tracker.is_tracked('vol-1'))
+        self.assertTrue(os.path.exists(tracker.path))
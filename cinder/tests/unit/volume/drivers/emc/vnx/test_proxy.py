@@ -0,0 +1,122 @@
+# Copyright (c) 2016 EMC Corporation, Inc.
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+from cinder import test
+from cinder.volume.drivers.emc.vnx import proxy
+
+
+class FakeLun(object):
+    __module__ = 'storops.vnx.resource.lun'
+
+    def __init__(self, name):
+        self.name = name
+        self.poll = True
+
+    def delete(self):
+        return 'deleted %s' % self.name
+
+    def with_no_poll(self):
+        return 'context'
+
+    def __eq__(self, other):
+        return isinstance(other, FakeLun) and self.name == other.name
+
+    def __hash__(self):
+        return hash(self.name)
+
+
+class FakeSystem(object):
+    __module__ = 'storops.vnx.resource.system'
+
+    def get_lun(self, name):
+        return FakeLun(name)
+
+    def get_luns(self):
+        return [FakeLun('a'), FakeLun('b')]
+
+    def is_same(self, lun):
+        return isinstance(lun, FakeLun)
+
+
+class CallCollector(proxy.Interceptor):
+    def __init__(self):
+        self.calls = []
+
+    def intercept(self, invoke, call, args, kwargs):
+        self.calls.append((call.kind, call.full_name))
+        return invoke(*args, **kwargs)
+
+
+class TestStoropsProxy(test.TestCase):
+    def setUp(self):
+        super(TestStoropsProxy, self).setUp()
+        self.collector = CallCollector()
+        self.vnx = proxy.StoropsProxy(FakeSystem(), self.collector)
+
+    def test_call_intercepted(self):
+        lun = self.vnx.get_lun('lun1')
+        self.assertIsInstance(lun, proxy.StoropsProxy)
+        self.assertEqual('deleted lun1', lun.delete())
+        self.assertEqual([('call', 'FakeSystem.get_lun'),
+                          ('call', 'FakeLun.delete')],
+                         self.collector.calls)
+
+    def test_property_and_setter_intercepted(self):
+        lun = self.vnx.get_lun('lun1')
+        lun.poll = False
+        self.assertFalse(lun.poll)
+        self.assertEqual([('call', 'FakeSystem.get_lun'),
+                          ('set', 'FakeLun.poll'),
+                          ('get', 'FakeLun.poll')],
+                         self.collector.calls)
+
+    def test_passthrough_method(self):
+        lun = self.vnx.get_lun('lun1')
+        self.assertEqual('context', lun.with_no_poll())
+        self.assertEqual([('call', 'FakeSystem.get_lun')],
+                         self.collector.calls)
+
+    def test_arguments_unwrapped(self):
+        lun = self.vnx.get_lun('lun1')
+        self.assertTrue(self.vnx.is_same(lun))
+        self.assertEqual(lun, FakeLun('lun1'))
+
+    def test_list_items_wrapped(self):
+        luns = self.vnx.get_luns()
+        self.assertEqual(2, len(luns))
+        self.assertTrue(all(isinstance(lun, proxy.StoropsProxy)
+                            for lun in luns))
+
+    def test_chain_order(self):
+        order = []
+
+        class Named(proxy.Interceptor):
+            def __init__(self, name):
+                self.name = name
+
+            def intercept(self, invoke, call, args, kwargs):
+                order.append(self.name)
+                return invoke(*args, **kwargs)
+
+        chain = proxy.InterceptorChain([Named('outer'), Named('inner')])
+        vnx = proxy.StoropsProxy(FakeSystem(), chain)
+        vnx.get_lun('lun1')
+        self.assertEqual(['outer', 'inner'], order)
+
+    def test_call_is_read(self):
+        self.assertTrue(proxy.StoropsCall('VNXSystem', 'get_lun').is_read)
+        self.assertTrue(proxy.StoropsCall('VNXLun', 'name', 'get').is_read)
+        self.assertFalse(proxy.StoropsCall('VNXLun', 'delete').is_read)
+        self.assertFalse(proxy.StoropsCall('VNXLun', 'tier', 'set').is_read)
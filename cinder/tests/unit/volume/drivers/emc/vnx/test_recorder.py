@@ -0,0 +1,113 @@
+# Copyright (c) 2016 EMC Corporation, Inc.
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import os
+import shutil
+import tempfile
+
+import mock
+
+from cinder import test
+from cinder.tests.unit.volume.drivers.emc.vnx import fake_exception \
+    as storops_ex
+from cinder.tests.unit.volume.drivers.emc.vnx import fake_storops as storops
+from cinder.tests.unit.volume.drivers.emc.vnx import test_proxy
+from cinder.volume.drivers.emc.vnx import proxy
+from cinder.volume.drivers.emc.vnx import recorder
+
+
+class FailingSystem(test_proxy.FakeSystem):
+    def get_lun(self, name):
+        raise storops_ex.VNXLunNotFoundError('lun %s not found' % name)
+
+
+class TestRecorder(test.TestCase):
+    def setUp(self):
+        super(TestRecorder, self).setUp()
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.path = os.path.join(self.tmp_dir, 'calls.log')
+        self.recorder = recorder.CallRecorder(self.path)
+        self.addCleanup(self.recorder.close)
+
+    def test_summarize(self):
+        self.assertEqual(1, recorder.summarize(1))
+        self.assertEqual(['a', None], recorder.summarize(('a', None)))
+        self.assertEqual({'type': 'FakeLun'},
+                         recorder.summarize(test_proxy.FakeLun('l')))
+        self.assertEqual({'enum': 'VNXMigrationRate', 'value': 'high'},
+                         recorder.summarize(storops.VNXMigrationRate.HIGH))
+
+    def test_record_calls(self):
+        vnx = proxy.StoropsProxy(test_proxy.FakeSystem(), self.recorder)
+        vnx.get_lun('lun1').delete()
+        self.recorder.close()
+        entries = recorder.load_log(self.path)
+        self.assertEqual(['FakeSystem.get_lun', 'FakeLun.delete'],
+                         [entry['n'] for entry in entries])
+        self.assertEqual(['lun1'], entries[0]['a'])
+        self.assertEqual({'type': 'FakeLun'}, entries[0]['r'])
+        self.assertEqual('deleted lun1', entries[1]['r'])
+
+    def test_record_error(self):
+        vnx = proxy.StoropsProxy(FailingSystem(), self.recorder)
+        self.assertRaises(storops_ex.VNXLunNotFoundError,
+                          vnx.get_lun, 'lun1')
+        self.recorder.close()
+        entry = recorder.load_log(self.path)[0]
+        self.assertEqual('VNXLunNotFoundError', entry['e'])
+        self.assertNotIn('r', entry)
+
+
+class TestReplaySystem(test.TestCase):
+    def _build(self, entries):
+        return recorder.ReplaySystem(entries, honour_latency=True)
+
+    @mock.patch('time.sleep')
+    def test_replay(self, mock_sleep):
+        system = self._build([
+            {'k': 'call', 'n': 'VNXSystem.get_lun', 'r': {'type': 'VNXLun'},
+             'd': 0.5},
+            {'k': 'get', 'n': 'VNXLun.lun_id', 'r': 3, 'd': 0},
+            {'k': 'call', 'n': 'VNXLun.delete', 'r': None, 'd': 1.5}])
+        lun = system.root.get_lun(name='lun1')
+        self.assertEqual(3, lun.lun_id)
+        lun.delete(force_detach=True)
+        self.assertEqual(0, system.remaining())
+        mock_sleep.assert_has_calls([mock.call(0.5), mock.call(1.5)])
+
+    @mock.patch('time.sleep')
+    def test_replay_error(self, mock_sleep):
+        system = self._build([
+            {'k': 'call', 'n': 'VNXSystem.get_lun',
+             'e': 'VNXLunNotFoundError', 'm': 'not found', 'd': 0}])
+        self.assertRaises(storops_ex.VNXLunNotFoundError,
+                          system.root.get_lun, name='lun1')
+
+    def test_replay_mismatch(self):
+        system = self._build([])
+        self.assertRaises(recorder.ReplayMismatchException,
+                          system.root.get_pool)
+
+    def test_replay_into_client(self):
+        path = os.path.join(tempfile.mkdtemp(), 'calls.log')
+        self.addCleanup(shutil.rmtree, os.path.dirname(path))
+        with open(path, 'w') as f:
+            f.write('{"k":"get","n":"VNXSystem.serial","r":"APM0001","d":0}'
+                    '\n')
+        client = mock.Mock()
+        system = recorder.replay(client, path)
+        self.assertEqual('APM0001', client.vnx.serial)
+        self.assertEqual(0, system.remaining())
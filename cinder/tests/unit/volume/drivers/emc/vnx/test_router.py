@@ -0,0 +1,143 @@
+# Copyright (c) 2016 EMC Corporation, Inc.
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import collections
+import threading
+
+import mock
+
+from cinder import test
+from cinder.tests.unit.volume.drivers.emc.vnx import fake_exception \
+    as storops_ex
+from cinder.tests.unit.volume.drivers.emc.vnx import test_proxy
+from cinder.tests.unit.volume.drivers.emc.vnx import utils
+from cinder.volume.drivers.emc.vnx import client as vnx_client
+from cinder.volume.drivers.emc.vnx import proxy
+from cinder.volume.drivers.emc.vnx import router
+
+
+class SPSystem(test_proxy.FakeSystem):
+    def __init__(self, sp, release=None, error=None):
+        self.sp = sp
+        self.release = release
+        self.error = error
+        self.calls = []
+
+    def get_lun(self, name):
+        self.calls.append(('get_lun', name))
+        if self.release is not None:
+            self.release.wait()
+        if self.error:
+            raise self.error
+        return test_proxy.FakeLun('%s@%s' % (name, self.sp))
+
+    def create_lun(self, name):
+        self.calls.append(('create_lun', name))
+        return test_proxy.FakeLun(name)
+
+
+class TestLatencyTracker(test.TestCase):
+    def setUp(self):
+        super(TestLatencyTracker, self).setUp()
+        self.tracker = router.LatencyTracker()
+
+    def test_rank_by_latency(self):
+        self.tracker.record('spa', 2.0, False)
+        self.tracker.record('spb', 0.5, False)
+        self.assertEqual(['spb', 'spa'], self.tracker.rank(['spa', 'spb']))
+
+    def test_rank_unhealthy_last(self):
+        self.tracker.record('spa', 2.0, False)
+        self.tracker.record('spb', 0.5, True)
+        self.assertFalse(self.tracker.health('spb').healthy)
+        self.assertEqual(['spa', 'spb'], self.tracker.rank(['spa', 'spb']))
+
+    def test_moving_average(self):
+        self.tracker.record('spa', 1.0, False)
+        self.tracker.record('spa', 2.0, True)
+        stats = self.tracker.get_stats()['spa']
+        self.assertAlmostEqual(1.2, stats['latency'])
+        self.assertAlmostEqual(0.2, stats['error_rate'])
+        self.assertEqual(2, stats['calls'])
+        self.assertEqual(1, stats['errors'])
+
+    @mock.patch('time.time')
+    def test_stale_sp_probed(self, mock_time):
+        mock_time.return_value = 1000
+        self.tracker.record('spa', 0.5, False)
+        self.tracker.record('spb', 0.1, True)
+        self.assertEqual(['spa', 'spb'], self.tracker.rank(['spa', 'spb']))
+        mock_time.return_value = 1000 + router.STALE_AFTER + 1
+        self.assertEqual(['spa', 'spb'], self.tracker.rank(['spa', 'spb']))
+        self.tracker.record('spa', 0.5, False)
+        self.assertEqual(['spb', 'spa'], self.tracker.rank(['spa', 'spb']))
+
+
+class TestSPRouter(test.TestCase):
+    def _build(self, spa, spb, hedge_after=0):
+        self.tracker = router.LatencyTracker()
+        systems = collections.OrderedDict([('spa', spa), ('spb', spb)])
+        return router.SPRouter(systems, proxy.InterceptorChain([self.tracker]),
+                               self.tracker, hedge_after)
+
+    def test_read_routed_to_faster_sp(self):
+        spa, spb = SPSystem('spa'), SPSystem('spb')
+        vnx = self._build(spa, spb)
+        self.tracker.record('spa', 3.0, False)
+        self.tracker.record('spb', 0.1, False)
+        lun = vnx.get_lun('lun1')
+        self.assertEqual(lun, test_proxy.FakeLun('lun1@spb'))
+        self.assertEqual('spb', object.__getattribute__(lun, '_sp'))
+        self.assertEqual([], spa.calls)
+        self.assertEqual('spb', vnx.best_sp())
+
+    def test_write_goes_to_primary(self):
+        spa, spb = SPSystem('spa'), SPSystem('spb')
+        vnx = self._build(spa, spb)
+        self.tracker.record('spa', 3.0, False)
+        self.tracker.record('spb', 0.1, False)
+        vnx.create_lun('lun1')
+        self.assertEqual([('create_lun', 'lun1')], spa.calls)
+        self.assertEqual([], spb.calls)
+
+    def test_hedged_read(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+        spa, spb = SPSystem('spa', release=release), SPSystem('spb')
+        vnx = self._build(spa, spb, hedge_after=0.01)
+        lun = vnx.get_lun('lun1')
+        self.assertEqual(lun, test_proxy.FakeLun('lun1@spb'))
+        self.assertEqual(1, self.tracker.get_stats()['spb']['hedged'])
+
+    def test_read_error_not_hedged(self):
+        error = storops_ex.VNXLunNotFoundError('not found')
+        spa, spb = SPSystem('spa', error=error), SPSystem('spb')
+        vnx = self._build(spa, spb, hedge_after=10)
+        self.assertRaises(storops_ex.VNXLunNotFoundError,
+                          vnx.get_lun, 'lun1')
+        self.assertEqual([], spb.calls)
+        self.assertEqual(1, self.tracker.get_stats()['spa']['errors'])
+
+
+class TestClientRouting(test.TestCase):
+    def test_client_with_secondary_sp(self):
+        with utils.patch_vnxsystem as patched_vnx:
+            client = vnx_client.Client('192.168.1.2', 'sysadmin', 'sysadmin',
+                                       'global', None, None,
+                                       secondary_sp_ip='192.168.1.3')
+        self.assertEqual(2, patched_vnx.call_count)
+        self.assertIsInstance(client.vnx, router.SPRouter)
+        self.assertEqual('192.168.1.2', client.get_available_ip())
+        self.assertEqual(0, client.get_sp_stats()['192.168.1.3']['calls'])
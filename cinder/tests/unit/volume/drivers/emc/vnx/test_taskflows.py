@@ -13,6 +13,9 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import time
+
+import mock
 import taskflow.engines
 from taskflow.patterns import linear_flow
 from taskflow.types import failure
@@ -65,6 +68,25 @@ class TestTaskflow(test.TestCase):
         smp_id = engine.storage.fetch('smp_id')
         self.assertEqual(15, smp_id)
 
+    def test_create_smp_task_from_warm_pool(self):
+        client = mock.Mock()
+        smp_pool = mock.Mock()
+        smp_pool.claim.return_value = mock.Mock(lun_id=16)
+        store_spec = {
+            'client': client,
+            'smp_name': 'mount_point_name',
+            'base_lun_name': 'base_name',
+            'smp_pool': smp_pool
+        }
+        self.work_flow.add(vnx_taskflow.CreateSMPTask())
+        engine = taskflow.engines.load(self.work_flow,
+                                       store=store_spec)
+        engine.run()
+        self.assertEqual(16, engine.storage.fetch('smp_id'))
+        smp_pool.claim.assert_called_once_with('base_name',
+                                               'mount_point_name')
+        client.create_mount_point.assert_not_called()
+
     @res_mock.patch_client
     def test_create_smp_task_revert(self, client, mocked):
         store_spec = {
@@ -215,3 +237,64 @@ class TestTaskflow(test.TestCase):
         engine = taskflow.engines.load(self.work_flow,
                                        store=store_spec)
         engine.run()
+
+
+class TestBulkClone(test.TestCase):
+    def setUp(self):
+        super(TestBulkClone, self).setUp()
+        self.client = mock.Mock()
+        self.client.get_lun.return_value = mock.Mock(
+            lun_id=10, wwn='fake_wwn', total_capacity_gb=1)
+        self.client.create_lun.return_value = mock.Mock(lun_id=20,
+                                                        wwn='fake_wwn')
+        self.client.verify_migration.return_value = True
+
+    def _clone_specs(self, count):
+        return [{'lun_name': 'volume-%s' % i,
+                 'lun_size': 1,
+                 'pool_name': 'pool1',
+                 'provision': None,
+                 'tier': None,
+                 'async_migrate': False} for i in range(count)]
+
+    def test_create_cloned_volumes(self):
+        lun_ids, errors = vnx_taskflow.create_cloned_volumes(
+            self.client, 'snap', 1, 'base', self._clone_specs(3), 2)
+        self.assertEqual([10, 10, 10], lun_ids)
+        self.assertEqual({}, errors)
+        self.client.create_snapshot.assert_called_once_with(
+            1, 'snap', keep_for=None)
+        self.assertEqual(3, self.client.create_mount_point.call_count)
+        self.assertEqual(3, self.client.migrate_lun.call_count)
+        self.client.delete_snapshot.assert_called_once_with('snap')
+
+    def test_create_cloned_volumes_partial_failure(self):
+        def create_lun(name, **kwargs):
+            if name == 'volume-1_dest':
+                raise vnx_ex.VNXCreateLunError('failed')
+            return mock.Mock(lun_id=20, wwn='fake_wwn')
+
+        self.client.create_lun.side_effect = create_lun
+        lun_ids, errors = vnx_taskflow.create_cloned_volumes(
+            self.client, 'snap', 1, 'base', self._clone_specs(3), 2)
+        self.assertEqual([10, None, 10], lun_ids)
+        self.assertEqual([1], list(errors))
+        self.assertIsInstance(errors[1], vnx_ex.VNXCreateLunError)
+        # Only the SMP of the failed clone is deleted.
+        self.client.delete_lun.assert_called_once_with('volume-1')
+
+    def test_migrations_limited(self):
+        running = []
+        peak = []
+
+        def verify_migration(*args):
+            running.append(1)
+            peak.append(len(running))
+            time.sleep(0.01)
+            running.pop()
+            return True
+
+        self.client.verify_migration.side_effect = verify_migration
+        vnx_taskflow.create_cloned_volumes(
+            self.client, 'snap', 1, 'base', self._clone_specs(6), 2)
+        self.assertLessEqual(max(peak), 2)
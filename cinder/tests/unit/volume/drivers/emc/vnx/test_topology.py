@@ -0,0 +1,118 @@
+# Copyright (c) 2016 EMC Corporation, Inc.
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import os
+import shutil
+import tempfile
+
+import mock
+
+from cinder import test
+from cinder.volume import configuration as conf
+from cinder.volume.drivers.emc.vnx import adapter
+from cinder.volume.drivers.emc.vnx import topology
+from cinder.volume.drivers.emc.vnx import utils as vnx_utils
+
+
+def _build_topology():
+    return topology.Topology('APM0001', ['pool1'], ['A-0-0'], True, None)
+
+
+class TestTopologyCache(test.TestCase):
+    def setUp(self):
+        super(TestTopologyCache, self).setUp()
+        self.state_dir = os.path.join(tempfile.mkdtemp(), 'vnx', 'backend')
+        self.addCleanup(shutil.rmtree, os.path.dirname(
+            os.path.dirname(self.state_dir)))
+        self.cache = topology.TopologyCache(self.state_dir, {'san_ip': 'a'})
+
+    def test_save_and_load(self):
+        self.assertIsNone(self.cache.load())
+        self.cache.save(_build_topology())
+        loaded = self.cache.load()
+        self.assertEqual(_build_topology().to_dict(), loaded.to_dict())
+        self.assertFalse(loaded.is_discovered)
+
+    def test_load_with_other_key(self):
+        self.cache.save(_build_topology())
+        other = topology.TopologyCache(self.state_dir, {'san_ip': 'b'})
+        self.assertIsNone(other.load())
+
+    def test_load_corrupted(self):
+        os.makedirs(self.state_dir)
+        with open(self.cache.path, 'w') as f:
+            f.write('{not json')
+        self.assertIsNone(self.cache.load())
+
+
+class TestAdapterTopology(test.TestCase):
+    def setUp(self):
+        super(TestAdapterTopology, self).setUp()
+        self.state_path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.state_path)
+        self.flags(state_path=self.state_path)
+        self.configuration = conf.Configuration(None)
+        vnx_utils.init_ops(self.configuration)
+        self.configuration.san_ip = '192.168.1.1'
+        self.configuration.storage_vnx_authentication_type = 'global'
+        self.configuration.config_group = 'vnx_backend'
+        self.configuration.storage_protocol = 'iscsi'
+
+    def _setup_adapter(self):
+        vnx_adapter = adapter.ISCSIAdapter(self.configuration, None)
+        vnx_adapter.queue_path = os.path.join(self.state_path, 'vnx',
+                                              'vnx_backend')
+        port = mock.Mock(display_name='A-0-0')
+        pool = mock.Mock()
+        pool.name = 'pool1'
+        mocked_client = mock.Mock()
+        mocked_client.get_serial.return_value = 'APM0001'
+        mocked_client.get_pools.return_value = [pool]
+        mocked_client.is_fast_enabled.return_value = False
+        mocked_client.get_iscsi_targets.return_value = [port]
+        with mock.patch.object(adapter.client, 'Client',
+                               return_value=mocked_client), \
+                mock.patch.object(vnx_adapter, '_normalize_config'):
+            vnx_adapter.do_setup()
+        return vnx_adapter, mocked_client, port
+
+    def test_cold_start(self):
+        vnx_adapter, mocked_client, port = self._setup_adapter()
+        self.assertEqual('APM0001', vnx_adapter.serial_number)
+        self.assertEqual([port], vnx_adapter.allowed_ports)
+        self.assertEqual(['pool1'],
+                         vnx_adapter.topology_cache.load().pool_names)
+
+    def test_warm_start(self):
+        self._setup_adapter()
+        with mock.patch('threading.Thread') as mock_thread:
+            vnx_adapter, mocked_client, port = self._setup_adapter()
+        self.assertEqual('APM0001', vnx_adapter.serial_number)
+        mocked_client.get_serial.assert_not_called()
+        mocked_client.get_iscsi_targets.assert_not_called()
+        mock_thread.assert_called_once_with(
+            target=vnx_adapter.revalidate_topology)
+
+        vnx_adapter.revalidate_topology()
+        self.assertEqual([port], vnx_adapter.allowed_ports)
+        mocked_client.get_serial.assert_called_once_with()
+
+    def test_revalidate_failure_releases_ports(self):
+        self._setup_adapter()
+        with mock.patch('threading.Thread'):
+            vnx_adapter, mocked_client, port = self._setup_adapter()
+        mocked_client.get_serial.side_effect = OSError('unreachable')
+        vnx_adapter.revalidate_topology()
+        self.assertIsNone(vnx_adapter.allowed_ports)
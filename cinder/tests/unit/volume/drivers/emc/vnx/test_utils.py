@@ -55,6 +55,27 @@ class TestUtils(test.TestCase):
                                   ex, storops_ex.VNXCreateLunError)))
         mock_testmethod.assert_has_calls([mock.call()])
 
+    def test_run_concurrently(self):
+        results = utils.run_concurrently({'a': lambda: 1, 'b': lambda: 2})
+        self.assertEqual({'a': 1, 'b': 2}, results)
+
+    def test_run_concurrently_with_exception(self):
+        mock_testmethod = mock.Mock()
+        self.assertRaises(storops_ex.VNXLunNotFoundError,
+                          utils.run_concurrently,
+                          {'a': mock.Mock(
+                              side_effect=storops_ex.VNXLunNotFoundError()),
+                           'b': mock_testmethod})
+        mock_testmethod.assert_called_once_with()
+
+    def test_run_each_concurrently(self):
+        error = storops_ex.VNXLunNotFoundError()
+        results, errors = utils.run_each_concurrently(
+            {'a': lambda: 1, 'b': mock.Mock(side_effect=error)},
+            max_workers=1)
+        self.assertEqual({'a': 1}, results)
+        self.assertEqual({'b': error}, errors)
+
     def test_wait_until_with_params(self):
         mock_testmethod = mock.Mock(return_value=True)
         utils.wait_until(mock_testmethod,
@@ -18,6 +18,7 @@ import math
 import os
 import random
 import re
+import threading
 
 from oslo_config import cfg
 from oslo_log import log as logging
@@ -33,7 +34,10 @@ from cinder.i18n import _, _LI, _LE, _LW
 from cinder.objects import fields
 from cinder.volume.drivers.emc.vnx import client
 from cinder.volume.drivers.emc.vnx import common
+from cinder.volume.drivers.emc.vnx import lunpool
+from cinder.volume.drivers.emc.vnx import migration
 from cinder.volume.drivers.emc.vnx import taskflows as emc_taskflow
+from cinder.volume.drivers.emc.vnx import topology
 from cinder.volume.drivers.emc.vnx import utils
 from cinder.zonemanager import utils as zm_utils
 
@@ -55,7 +59,14 @@ class CommonAdapter(object):
         self.mirror_view = None
         self.storage_pools = None
         self.max_retries = 5
-        self.allowed_ports = None
+        self._allowed_ports = None
+        self._topology_ready = threading.Event()
+        self._topology_ready.set()
+        self.topology_cache = None
+        self.warm_lun_pool = None
+        self.warm_smp_pool = None
+        self.migration_rate_policy = None
+        self.migration_tracker = None
         self.force_delete_lun_in_sg = None
         self.max_over_subscription_ratio = None
         self.ignore_pool_full_threshold = None
@@ -73,11 +84,14 @@ class CommonAdapter(object):
             self.config.storage_vnx_authentication_type,
             self.config.naviseccli_path,
             self.config.storage_vnx_security_file_dir,
-            self.queue_path)
-        # Replication related
-        self.mirror_view = self.build_mirror_view(self.config, True)
-        self.serial_number = self.client.get_serial()
-        self.storage_pools = self.parse_pools()
+            self.queue_path,
+            call_log=self.config.storops_call_log,
+            max_cli_calls_per_sp=self.config.max_cli_calls_per_sp,
+            secondary_sp_ip=self.config.storage_vnx_secondary_sp_ip,
+            hedge_threshold=self.config.sp_hedge_threshold,
+            breaker_threshold=self.config.sp_breaker_failure_threshold,
+            breaker_probe_interval=self.config.sp_breaker_probe_interval,
+            max_migrations_per_sp=self.config.max_migrations_per_sp)
         self.force_delete_lun_in_sg = (
             self.config.force_delete_lun_in_storagegroup)
         self.max_over_subscription_ratio = (
@@ -88,7 +102,141 @@ class CommonAdapter(object):
         self.protocol = self.config.storage_protocol
         self.destroy_empty_sg = self.config.destroy_empty_storage_group
         self.itor_auto_dereg = self.config.initiator_auto_deregistration
-        self.set_extra_spec_defaults()
+        self.migration_rate_policy = migration.MigrationRatePolicy(
+            self.config.migration_rate_small_volume_size,
+            self.config.migration_rate_large_volume_size,
+            off_peak_hours=self.config.migration_rate_off_peak_hours,
+            busy_threshold=self.config.migration_rate_busy_threshold,
+            load=self.client.get_running_migrations)
+        self.migration_tracker = migration.MigrationTracker(
+            self.client, self.queue_path,
+            interval=self.config.async_migration_poll_interval)
+        self.migration_tracker.start()
+        self.topology_cache = topology.TopologyCache(self.queue_path,
+                                                     self._topology_key())
+        saved = self.topology_cache.load()
+        if saved is None:
+            discovered = self.discover_topology()
+            self.apply_topology(discovered)
+            self.topology_cache.save(discovered)
+            self.start_warm_lun_pool(discovered.pool_names)
+            self.start_warm_smp_pool()
+        else:
+            LOG.info(_LI('[%s] Starting with the saved array topology, which '
+                         'is revalidated in the background.'),
+                     self.config.config_group)
+            self.apply_topology(saved)
+            self._topology_ready.clear()
+            revalidation = threading.Thread(target=self.revalidate_topology)
+            revalidation.daemon = True
+            revalidation.start()
+            self.start_warm_lun_pool(saved.pool_names)
+            self.start_warm_smp_pool()
+
+    def start_warm_lun_pool(self, pool_names):
+        if not self.config.warm_lun_pool_sizes:
+            return
+        self.warm_lun_pool = lunpool.WarmLunPool(
+            self.client, self.config.warm_lun_pool_sizes,
+            self.config.warm_lun_pool_low_watermark,
+            self.config.warm_lun_pool_high_watermark,
+            ignore_thresholds=self.config.ignore_pool_full_threshold)
+        # Volumes without a volume type get the default specs.
+        default_specs = common.ExtraSpecs({})
+        for pool_name in pool_names:
+            self.warm_lun_pool.add_target(pool_name,
+                                          default_specs.provision,
+                                          default_specs.tier)
+        self.warm_lun_pool.start(self.config.warm_lun_pool_refill_interval)
+
+    def start_warm_smp_pool(self):
+        if self.config.warm_smp_pool_size <= 0:
+            return
+        self.warm_smp_pool = lunpool.WarmSmpPool(
+            self.client, self.config.warm_smp_pool_size,
+            self.config.warm_smp_pool_min_clones)
+        self.warm_smp_pool.start(self.config.warm_lun_pool_refill_interval)
+
+    @property
+    def allowed_ports(self):
+        if self._allowed_ports is None:
+            # The ports are discovered in the background on a warm start.
+            self._topology_ready.wait()
+        return self._allowed_ports
+
+    @allowed_ports.setter
+    def allowed_ports(self, ports):
+        self._allowed_ports = ports
+
+    def _topology_key(self):
+        return {'san_ip': self.config.san_ip,
+                'pools': self.config.storage_vnx_pool_names,
+                'io_ports': self.config.io_port_list,
+                'protocol': self.config.storage_protocol,
+                'replication': [device.get('backend_id') for device in
+                                self.config.replication_device or []]}
+
+    def get_target_ports(self):
+        """Returns the target ports of the protocol, if any."""
+        return None
+
+    def discover_topology(self):
+        """Queries the topology of the array concurrently."""
+        queries = {'serial': self.client.get_serial,
+                   'pools': self.parse_pools,
+                   'fast': self.client.is_fast_enabled,
+                   'ports': self.get_target_ports}
+        if self.config.replication_device:
+            queries['mirror_view'] = self.client.is_mirror_view_enabled
+        found = utils.run_concurrently(queries)
+        ports = found['ports']
+        port_names = (None if ports is None
+                      else [port.display_name for port in ports])
+        return topology.Topology(
+            found['serial'],
+            [pool.name for pool in found['pools']],
+            port_names,
+            found['fast'],
+            mirror_view_enabled=found.get('mirror_view'),
+            pools=found['pools'],
+            ports=ports)
+
+    def apply_topology(self, array_topology, build_mirror_view=True):
+        self.serial_number = array_topology.serial
+        if build_mirror_view:
+            # Replication related
+            self.mirror_view = self.build_mirror_view(
+                self.config, True,
+                mirror_view_enabled=array_topology.mirror_view_enabled)
+        if array_topology.pools is not None:
+            self.storage_pools = array_topology.pools
+        if array_topology.ports is not None:
+            self.allowed_ports = self.validate_ports(
+                array_topology.ports, self.config.io_port_list)
+            LOG.debug('[%(group)s] allowed_ports are: [%(ports)s].',
+                      {'group': self.config.config_group,
+                       'ports': ','.join(
+                           [port.display_name
+                            for port in self.allowed_ports])})
+        self.set_extra_spec_defaults(array_topology.fast_enabled)
+
+    def revalidate_topology(self):
+        """Discovers the array again after a warm start."""
+        try:
+            discovered = self.discover_topology()
+            if discovered.serial != self.serial_number:
+                LOG.warning(_LW('[%(group)s] The serial number of the array '
+                                'changed from %(saved)s to %(found)s.'),
+                            {'group': self.config.config_group,
+                             'saved': self.serial_number,
+                             'found': discovered.serial})
+            self.apply_topology(discovered, build_mirror_view=False)
+            self.topology_cache.save(discovered)
+        except Exception:
+            LOG.exception(_LE('[%s] Failed to revalidate the saved array '
+                              'topology.'), self.config.config_group)
+        finally:
+            self._topology_ready.set()
 
     def _normalize_config(self):
         group_name = (
@@ -136,6 +284,43 @@ class CommonAdapter(object):
                     value=io_port_list)
             self.config.io_port_list = io_port_list
 
+        # Check option `migration_rate_off_peak_hours`.
+        # Raise error if it is not a window of hours like 22-6.
+        off_peak_hours = self.config.migration_rate_off_peak_hours
+        if off_peak_hours:
+            try:
+                self.config.migration_rate_off_peak_hours = (
+                    migration.parse_hours(off_peak_hours))
+            except ValueError:
+                raise exception.InvalidConfigurationValue(
+                    option='[{group}] migration_rate_off_peak_hours'.format(
+                        group=self.config.config_group),
+                    value=off_peak_hours)
+
+        # Check options `warm_lun_pool_*`.
+        # Raise error if a size is not a positive integer or the watermarks
+        # are out of order.
+        warm_sizes = self.config.warm_lun_pool_sizes
+        if warm_sizes:
+            option = '[{group}] warm_lun_pool_sizes'.format(
+                group=self.config.config_group)
+            try:
+                warm_sizes = [int(size) for size in warm_sizes
+                              if len(size.strip()) != 0]
+            except ValueError:
+                raise exception.InvalidConfigurationValue(option=option,
+                                                          value=warm_sizes)
+            if any(size <= 0 for size in warm_sizes):
+                raise exception.InvalidConfigurationValue(option=option,
+                                                          value=warm_sizes)
+            self.config.warm_lun_pool_sizes = warm_sizes
+            if not (0 < self.config.warm_lun_pool_low_watermark <=
+                    self.config.warm_lun_pool_high_watermark):
+                raise exception.InvalidConfigurationValue(
+                    option='[{group}] warm_lun_pool_low_watermark'.format(
+                        group=self.config.config_group),
+                    value=self.config.warm_lun_pool_low_watermark)
+
         if self.config.ignore_pool_full_threshold:
             LOG.warning(_LW('[%(group)s] ignore_pool_full_threshold: True. '
                             'LUN creation will still be forced even if the '
@@ -201,10 +386,12 @@ class CommonAdapter(object):
                 data=_('No valid ports.'))
         return result_ports
 
-    def set_extra_spec_defaults(self):
+    def set_extra_spec_defaults(self, fast_enabled=None):
         provision_default = storops.VNXProvisionEnum.THICK
         tier_default = None
-        if self.client.is_fast_enabled():
+        if fast_enabled is None:
+            fast_enabled = self.client.is_fast_enabled()
+        if fast_enabled:
             tier_default = storops.VNXTieringEnum.HIGH_AUTO
         common.ExtraSpecs.set_defaults(provision_default, tier_default)
 
@@ -231,10 +418,17 @@ class CommonAdapter(object):
                   'provision': provision,
                   'tier': tier})
 
-        lun = self.client.create_lun(
-            pool, volume_name, volume_size,
-            provision, tier, volume.consistencygroup_id,
-            ignore_thresholds=self.config.ignore_pool_full_threshold)
+        lun = None
+        if self.warm_lun_pool:
+            lun = self.warm_lun_pool.claim(pool, volume_name, volume_size,
+                                           provision, tier)
+            if lun is not None and volume.consistencygroup_id:
+                self.client.add_lun_to_cg(volume.consistencygroup_id, lun)
+        if lun is None:
+            lun = self.client.create_lun(
+                pool, volume_name, volume_size,
+                provision, tier, volume.consistencygroup_id,
+                ignore_thresholds=self.config.ignore_pool_full_threshold)
         location = self._build_provider_location(
             lun_type='lun',
             lun_id=lun.lun_id,
@@ -316,7 +510,8 @@ class CommonAdapter(object):
                 new_snap_name=utils.construct_snap_name(volume),
                 lun_name=volume.name,
                 base_lun_name=base_lun_name,
-                pool_name=pool)
+                pool_name=pool,
+                smp_pool=self.warm_smp_pool)
 
             location = self._build_provider_location(
                 lun_type='smp',
@@ -337,7 +532,9 @@ class CommonAdapter(object):
                 pool_name=pool,
                 provision=provision,
                 tier=tier,
-                new_snap_name=new_snap_name)
+                new_snap_name=new_snap_name,
+                rate=self.select_migration_rate(volume, async_migrate),
+                progress_callback=self.get_progress_recorder(volume))
 
             location = self._build_provider_location(
                 lun_type='lun',
@@ -345,6 +542,8 @@ class CommonAdapter(object):
                 base_lun_name=volume.name)
             volume_metadata['snapcopy'] = 'False'
             volume_metadata['async_migrate'] = six.text_type(async_migrate)
+            if async_migrate:
+                self.track_migration(volume, new_lun_id, new_snap_name)
             rep_update = self.setup_lun_replication(volume, new_lun_id)
 
         model_update = {'provider_location': location,
@@ -371,8 +570,8 @@ class CommonAdapter(object):
                 snap_name=snap_name,
                 lun_id=source_lun_id,
                 lun_name=volume.name,
-                base_lun_name=base_lun_name
-            )
+                base_lun_name=base_lun_name,
+                smp_pool=self.warm_smp_pool)
             location = self._build_provider_location(
                 lun_type='smp',
                 lun_id=new_lun_id,
@@ -391,7 +590,9 @@ class CommonAdapter(object):
                 pool_name=pool,
                 provision=provision,
                 tier=tier,
-                async_migrate=async_migrate)
+                async_migrate=async_migrate,
+                rate=self.select_migration_rate(volume, async_migrate),
+                progress_callback=self.get_progress_recorder(volume))
             # After migration, volume's base lun is itself
             location = self._build_provider_location(
                 lun_type='lun',
@@ -399,6 +600,8 @@ class CommonAdapter(object):
                 base_lun_name=volume.name)
             volume_metadata['snapcopy'] = 'False'
             volume_metadata['async_migrate'] = six.text_type(async_migrate)
+            if async_migrate:
+                self.track_migration(volume, new_lun_id, snap_name)
             rep_update = self.setup_lun_replication(volume, new_lun_id)
 
         model_update = {'provider_location': location,
@@ -406,6 +609,136 @@ class CommonAdapter(object):
         model_update.update(rep_update)
         return model_update
 
+    def create_cloned_volumes(self, volumes, src_vref):
+        """Creates clones of one volume from a single snapshot.
+
+        The full clones share one snapshot of the source, and their
+        migrations run under `bulk_clone_max_migrations`. Snapcopy clones
+        are created one by one, as they each keep their own snapshot.
+
+        :returns: list of the model updates of the volumes. The failed
+                  volumes get the `error` status.
+        """
+        base_lun_name = utils.get_base_lun_name(src_vref)
+        source_lun_id = self.client.get_lun_id(src_vref)
+        model_updates = {}
+        bulk_volumes = []
+        for volume in volumes:
+            if utils.is_snapcopy_enabled(volume):
+                try:
+                    model_updates[volume.id] = self.create_cloned_volume(
+                        volume, src_vref)
+                except Exception:
+                    LOG.exception(_LE('Failed to clone %(src)s to '
+                                      '%(volume)s.'),
+                                  {'src': src_vref.id, 'volume': volume.id})
+                    model_updates[volume.id] = {'status': 'error'}
+            else:
+                bulk_volumes.append(volume)
+
+        clone_specs = []
+        for volume in bulk_volumes:
+            specs = common.ExtraSpecs.from_volume(volume)
+            async_migrate, provision = utils.calc_migrate_and_provision(
+                volume)
+            clone_specs.append({'lun_name': volume.name,
+                                'lun_size': volume.size,
+                                'pool_name': utils.get_pool_from_host(
+                                    volume.host),
+                                'provision': provision,
+                                'tier': specs.tier,
+                                'async_migrate': async_migrate,
+                                'rate': self.select_migration_rate(
+                                    volume, async_migrate)})
+        if clone_specs:
+            bulk_snap_name = utils.construct_bulk_snap_name(src_vref)
+            lun_ids, errors = emc_taskflow.create_cloned_volumes(
+                client=self.client,
+                snap_name=bulk_snap_name,
+                lun_id=source_lun_id,
+                base_lun_name=base_lun_name,
+                clone_specs=clone_specs,
+                max_migrations=self.config.bulk_clone_max_migrations)
+            for i, volume in enumerate(bulk_volumes):
+                if i in errors:
+                    LOG.error(_LE('Failed to clone %(src)s to %(volume)s: '
+                                  '%(ex)s.'),
+                              {'src': src_vref.id, 'volume': volume.id,
+                               'ex': errors[i]})
+                    model_updates[volume.id] = {'status': 'error'}
+                    continue
+                volume_metadata = utils.get_metadata(volume)
+                volume_metadata['snapcopy'] = 'False'
+                volume_metadata['async_migrate'] = six.text_type(
+                    clone_specs[i]['async_migrate'])
+                if clone_specs[i]['async_migrate']:
+                    self.track_migration(volume, lun_ids[i], bulk_snap_name)
+                model_update = {
+                    'provider_location': self._build_provider_location(
+                        lun_type='lun',
+                        lun_id=lun_ids[i],
+                        base_lun_name=volume.name),
+                    'metadata': volume_metadata}
+                model_update.update(
+                    self.setup_lun_replication(volume, lun_ids[i]))
+                model_updates[volume.id] = model_update
+
+        volume_model_updates = []
+        for volume in volumes:
+            model_update = {'id': volume.id}
+            model_update.update(model_updates[volume.id])
+            volume_model_updates.append(model_update)
+        return volume_model_updates
+
+    def track_migration(self, volume, src_lun_id, snap_name):
+        """Follows the async migration of a new volume.
+
+        The temporary snapshot is deleted once the migration is over.
+        """
+        if self.migration_tracker:
+            self.migration_tracker.track(volume.id, src_lun_id, snap_name)
+
+    def get_migration_progress(self, volume):
+        """Returns the progress of the async migration of the volume.
+
+        Returns None if the volume is not migrating.
+        """
+        if self.migration_tracker:
+            return self.migration_tracker.get_progress(volume.id)
+
+    def get_progress_recorder(self, volume):
+        """Returns a callback storing the migration progress of a volume.
+
+        The progress goes to the admin metadata of the volume, if
+        `migration_progress_in_admin_metadata` is set. Returns None
+        otherwise.
+        """
+        if not self.config.migration_progress_in_admin_metadata:
+            return None
+
+        def _record(progress):
+            admin_metadata = dict(volume.admin_metadata or {})
+            admin_metadata['migration_percent_complete'] = six.text_type(
+                progress['percent_complete'])
+            admin_metadata['migration_eta'] = (
+                six.text_type(int(progress['eta']))
+                if progress['eta'] is not None else 'unknown')
+            volume.admin_metadata = admin_metadata
+            volume.save()
+        return _record
+
+    def select_migration_rate(self, volume, async_migrate):
+        """Returns the rate of a migration of the volume, or None.
+
+        The `migrate_rate` metadata of the volume takes precedence over the
+        rate policy.
+        """
+        rate = utils.get_migration_rate(volume)
+        if rate is None and self.migration_rate_policy:
+            rate = self.migration_rate_policy.select(volume.size,
+                                                     async_migrate)
+        return rate
+
     def migrate_volume(self, context, volume, host):
         """Leverage the VNX on-array migration functionality.
 
@@ -424,7 +757,7 @@ class CommonAdapter(object):
             volume, host, self.serial_number, self.protocol)
         if not r:
             return r, None
-        rate = utils.get_migration_rate(volume)
+        rate = self.select_migration_rate(volume, False)
 
         new_pool = utils.get_pool_from_host(host['host'])
         lun_id = self.client.get_lun_id(volume)
@@ -434,7 +767,8 @@ class CommonAdapter(object):
 
         emc_taskflow.run_migration_taskflow(
             self.client, lun_id, lun_name, volume.size,
-            new_pool, provision, tier, rate)
+            new_pool, provision, tier, rate,
+            progress_callback=self.get_progress_recorder(volume))
 
         # A smp will become a LUN after migration
         if utils.is_volume_smp(volume):
@@ -730,11 +1064,29 @@ class CommonAdapter(object):
             device.backend_id for device in common.ReplicationDeviceList(
                 self.config)]
 
+    def append_cli_stats(self, stats):
+        admission_stats = self.client.get_admission_stats()
+        if admission_stats:
+            stats['cli_admission'] = admission_stats
+        sp_stats = self.client.get_sp_stats()
+        if sp_stats:
+            stats['sp_health'] = sp_stats
+        migration_stats = self.client.get_migration_stats()
+        if migration_stats:
+            stats['migrations'] = migration_stats
+        if self.warm_lun_pool:
+            stats['warm_lun_pool'] = self.warm_lun_pool.get_stats()
+        if self.warm_smp_pool:
+            stats['warm_smp_pool'] = self.warm_smp_pool.get_stats()
+        if self.migration_tracker:
+            stats['async_migrations'] = self.migration_tracker.get_stats()
+
     def update_volume_stats(self):
         stats = self.get_enabler_stats()
         stats['pools'] = self.get_pool_stats(stats)
         stats['storage_protocol'] = self.config.storage_protocol
         self.append_replication_stats(stats)
+        self.append_cli_stats(stats)
         return stats
 
     def delete_volume(self, volume):
@@ -743,6 +1095,11 @@ class CommonAdapter(object):
         snap_copy = (utils.construct_snap_name(volume)
                      if utils.is_snapcopy_enabled(volume) else None)
         self.cleanup_lun_replication(volume)
+        if self.migration_tracker:
+            self.migration_tracker.forget(volume.id)
+        if self.warm_smp_pool:
+            # The warm SMPs would keep the LUN from being deleted.
+            self.warm_smp_pool.release(volume.name)
         try:
             self.client.delete_lun(volume.name,
                                    force=self.force_delete_lun_in_sg,
@@ -1130,12 +1487,15 @@ class CommonAdapter(object):
                 _LI('Successfully destroyed replication for volume: %s'),
                 volume.id)
 
-    def build_mirror_view(self, configuration, failover=True):
+    def build_mirror_view(self, configuration, failover=True,
+                          mirror_view_enabled=None):
         """Builds a mirror view operation class.
 
         :param configuration: driver configuration
         :param failover: True if from primary to configured array,
         False if from configured array to primary.
+        :param mirror_view_enabled: whether the MirrorView/S enabler is
+        installed, if already known.
         """
         rep_devices = configuration.replication_device
         if not rep_devices:
@@ -1143,7 +1503,9 @@ class CommonAdapter(object):
                      configuration.config_group)
             return None
         elif len(rep_devices) == 1:
-            if not self.client.is_mirror_view_enabled():
+            if mirror_view_enabled is None:
+                mirror_view_enabled = self.client.is_mirror_view_enabled()
+            if not mirror_view_enabled:
                 error_msg = _('Replication is configured, '
                               'but no MirrorView/S enabler installed on VNX.')
                 raise exception.InvalidInput(reason=error_msg)
@@ -1256,13 +1618,9 @@ class ISCSIAdapter(CommonAdapter):
         super(ISCSIAdapter, self).do_setup()
 
         self.iscsi_initiator_map = self.config.iscsi_initiators
-        self.allowed_ports = self.validate_ports(
-            self.client.get_iscsi_targets(),
-            self.config.io_port_list)
-        LOG.debug('[%(group)s] allowed_ports are: [%(ports)s].',
-                  {'group': self.config.config_group,
-                   'ports': ','.join(
-                       [port.display_name for port in self.allowed_ports])})
+
+    def get_target_ports(self):
+        return self.client.get_iscsi_targets()
 
     def _normalize_config(self):
         super(ISCSIAdapter, self)._normalize_config()
@@ -1387,13 +1745,9 @@ class FCAdapter(CommonAdapter):
         super(FCAdapter, self).do_setup()
 
         self.lookup_service = zm_utils.create_lookup_service()
-        self.allowed_ports = self.validate_ports(
-            self.client.get_fc_targets(),
-            self.config.io_port_list)
-        LOG.debug('[%(group)s] allowed_ports are: [%(ports)s].',
-                  {'group': self.config.config_group,
-                   'ports': ','.join(
-                       [port.display_name for port in self.allowed_ports])})
+
+    def get_target_ports(self):
+        return self.client.get_fc_targets()
 
     def update_volume_stats(self):
         """Retrieves stats info."""
@@ -0,0 +1,161 @@
+# Copyright (c) 2016 EMC Corporation, Inc.
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+"""
+VNX storage processor circuit breakers
+
+A `CircuitBreaker` opens after a number of consecutive failures of the
+calls served by its SP. While it is open, `router.SPRouter` sends the calls
+to the peer SP instead of waiting for the CLI timeout of the dead one, and
+the SP is probed in the background. The breaker closes on the first
+successful probe.
+
+Only failures to reach the SP count. Storops errors reporting the outcome
+of a command, like a LUN not found, mean the SP answered.
+"""
+
+import threading
+import time
+
+from oslo_log import log as logging
+from oslo_service import loopingcall
+from oslo_utils import importutils
+
+storops = importutils.try_import('storops')
+if storops:
+    from storops import exception as storops_ex
+
+from cinder.i18n import _LI, _LW
+from cinder.volume.drivers.emc.vnx import proxy
+
+LOG = logging.getLogger(__name__)
+
+STATE_CLOSED = 'closed'
+STATE_OPEN = 'open'
+
+
+def is_sp_failure(ex):
+    """Tells whether `ex` means the SP could not be reached."""
+    return not isinstance(ex, storops_ex.VNXException)
+
+
+class CircuitBreaker(object):
+    """Circuit breaker of one SP.
+
+    :param sp: IP of the SP.
+    :param probe: callable which issues a cheap query to the SP and raises
+                  if the SP cannot be reached.
+    :param failure_threshold: consecutive failures which open the breaker.
+    :param probe_interval: seconds between two probes of an open breaker.
+    """
+
+    def __init__(self, sp, probe, failure_threshold, probe_interval):
+        self.sp = sp
+        self.probe = probe
+        self.failure_threshold = failure_threshold
+        self.probe_interval = probe_interval
+        self.state = STATE_CLOSED
+        self.failures = 0
+        self.trips = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+        self._timer = None
+
+    @property
+    def is_open(self):
+        return self.state == STATE_OPEN
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if (self.state == STATE_OPEN or
+                    self.failures < self.failure_threshold):
+                return
+            self.state = STATE_OPEN
+            self.trips += 1
+            self.opened_at = time.time()
+        LOG.warning(_LW('SP %(sp)s failed %(failures)s calls in a row. '
+                        'Sending calls to its peer until it recovers.'),
+                    {'sp': self.sp, 'failures': self.failures})
+        self._start_probe()
+
+    def close(self):
+        with self._lock:
+            self.state = STATE_CLOSED
+            self.failures = 0
+            self.opened_at = None
+            self._timer = None
+        LOG.info(_LI('SP %s recovered. Sending calls to it again.'), self.sp)
+
+    def _start_probe(self):
+        def _probe():
+            try:
+                self.probe()
+            except Exception as ex:
+                LOG.debug('SP %(sp)s is still unreachable: %(ex)s.',
+                          {'sp': self.sp, 'ex': ex})
+                return
+            self.close()
+            raise loopingcall.LoopingCallDone()
+
+        self._timer = loopingcall.FixedIntervalLoopingCall(_probe)
+        self._timer.start(interval=self.probe_interval,
+                          initial_delay=self.probe_interval)
+
+    def to_dict(self):
+        return {'state': self.state,
+                'failures': self.failures,
+                'trips': self.trips,
+                'opened_at': self.opened_at}
+
+
+class BreakerBoard(proxy.Interceptor):
+    """Circuit breakers of the SPs, fed by the outcome of each call."""
+
+    def __init__(self, breakers):
+        self.breakers = breakers
+
+    def intercept(self, invoke, call, args, kwargs):
+        breaker = self.breakers.get(call.sp)
+        if breaker is None:
+            return invoke(*args, **kwargs)
+        try:
+            result = invoke(*args, **kwargs)
+        except Exception as ex:
+            if is_sp_failure(ex):
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            raise
+        breaker.record_success()
+        return result
+
+    def available(self, sps):
+        """Filters out the SPs whose breaker is open.
+
+        All SPs are returned when all the breakers are open, so that calls
+        still have a chance to go through.
+        """
+        closed = [sp for sp in sps
+                  if sp not in self.breakers or
+                  not self.breakers[sp].is_open]
+        return closed or list(sps)
+
+    def get_stats(self):
+        return {sp: breaker.to_dict()
+                for sp, breaker in self.breakers.items()}
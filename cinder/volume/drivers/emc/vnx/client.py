@@ -16,6 +16,7 @@ from oslo_log import log as logging
 from oslo_utils import excutils
 from oslo_utils import importutils
 
+import collections
 import time
 
 storops = importutils.try_import('storops')
@@ -26,8 +27,14 @@ if storops:
 from cinder import exception
 from cinder.i18n import _, _LW, _LE, _LI
 from cinder import utils as cinder_utils
+from cinder.volume.drivers.emc.vnx import breaker
 from cinder.volume.drivers.emc.vnx import common
 from cinder.volume.drivers.emc.vnx import const
+from cinder.volume.drivers.emc.vnx import limiter
+from cinder.volume.drivers.emc.vnx import migration
+from cinder.volume.drivers.emc.vnx import proxy
+from cinder.volume.drivers.emc.vnx import recorder
+from cinder.volume.drivers.emc.vnx import router
 from cinder.volume.drivers.emc.vnx import utils
 
 
@@ -82,17 +89,55 @@ class Condition(object):
 
 class Client(object):
     def __init__(self, ip, username, password, scope,
-                 naviseccli, sec_file, queue_path=None):
+                 naviseccli, sec_file, queue_path=None, call_log=None,
+                 max_cli_calls_per_sp=0, secondary_sp_ip=None,
+                 hedge_threshold=0, breaker_threshold=3,
+                 breaker_probe_interval=common.INTERVAL_30_SEC,
+                 max_migrations_per_sp=0):
         self.naviseccli = naviseccli
+        self.ip = ip
         if not storops:
             msg = _('storops Python library is not installed.')
             raise exception.VolumeBackendAPIException(message=msg)
-        self.vnx = storops.VNXSystem(ip=ip,
-                                     username=username,
-                                     password=password,
-                                     scope=scope,
-                                     naviseccli=naviseccli,
-                                     sec_file=sec_file)
+        systems = collections.OrderedDict()
+        for sp_ip in filter(None, [ip, secondary_sp_ip]):
+            systems[sp_ip] = storops.VNXSystem(ip=sp_ip,
+                                               username=username,
+                                               password=password,
+                                               scope=scope,
+                                               naviseccli=naviseccli,
+                                               sec_file=sec_file)
+        self.vnx = systems[ip]
+        self.interceptors = proxy.InterceptorChain()
+        self.admission = None
+        if max_cli_calls_per_sp > 0:
+            self.admission = limiter.AdmissionController(
+                max_cli_calls_per_sp, lambda call: call.sp or self.ip)
+            self.interceptors.append(self.admission)
+        self.sp_tracker = None
+        self.sp_breakers = None
+        if len(systems) > 1:
+            self.sp_tracker = router.LatencyTracker()
+            self.interceptors.append(self.sp_tracker)
+            self.sp_breakers = breaker.BreakerBoard(
+                {sp_ip: breaker.CircuitBreaker(sp_ip, system.update,
+                                               breaker_threshold,
+                                               breaker_probe_interval)
+                 for sp_ip, system in systems.items()})
+            self.interceptors.append(self.sp_breakers)
+        if call_log:
+            self.interceptors.append(recorder.CallRecorder(call_log))
+        if self.sp_tracker:
+            self.vnx = router.SPRouter(systems, self.interceptors,
+                                       self.sp_tracker, hedge_threshold,
+                                       self.sp_breakers)
+        elif self.interceptors:
+            self.vnx = proxy.StoropsProxy(self.vnx, self.interceptors, ip)
+        self.migration_scheduler = None
+        self.sync_migrations = {}
+        if max_migrations_per_sp > 0:
+            self.migration_scheduler = migration.MigrationScheduler(
+                max_migrations_per_sp, self.session_finished)
         self.sg_cache = {}
         if queue_path:
             self.queue = storops_tasks.PQueue(path=queue_path)
@@ -114,13 +159,24 @@ class Client(object):
 
         utils.wait_until(condition=Condition.is_lun_io_ready, lun=lun)
         if cg_id:
-            cg = self.vnx.get_cg(name=cg_id)
-            cg.add_member(lun)
+            self.add_lun_to_cg(cg_id, lun)
         return lun
 
+    def add_lun_to_cg(self, cg_id, lun):
+        cg = self.vnx.get_cg(name=cg_id)
+        cg.add_member(lun)
+
     def get_lun(self, name=None, lun_id=None):
         return self.vnx.get_lun(name=name, lun_id=lun_id)
 
+    def get_luns(self):
+        return self.vnx.get_lun()
+
+    def rename_lun(self, name, new_name):
+        lun = self.get_lun(name=name)
+        lun.modify(new_name=new_name)
+        return self.get_lun(name=new_name)
+
     def get_lun_id(self, volume):
         """Retrieves the LUN ID of volume."""
         if volume.provider_location:
@@ -160,7 +216,8 @@ class Client(object):
 
     def delay_delete_lun(self, name):
         """Delay the deletion by putting it in a storops queue."""
-        self.queue.put(self.vnx.delete_lun, name=name)
+        # PQueue persists the bound method, so hand it the raw storops one.
+        self.queue.put(proxy.unwrap(self.vnx).delete_lun, name=name)
         LOG.info(_LI("VNX object has been added to queue for later"
                      " deletion: %s"), name)
 
@@ -194,14 +251,30 @@ class Client(object):
     def modify_lun(self):
         pass
 
+    def migrate_lun(self, src_id, dst_id,
+                    rate=const.MIGRATION_RATE_HIGH,
+                    priority=migration.PRIORITY_SYNC):
+        if not self.migration_scheduler:
+            return self._start_migration(src_id, dst_id, rate)
+        src = self.vnx.get_lun(lun_id=src_id)
+        self.migration_scheduler.acquire(src_id, src.current_owner.value,
+                                         priority)
+        try:
+            self._start_migration(src_id, dst_id, rate)
+        except Exception:
+            with excutils.save_and_reraise_exception():
+                self.migration_scheduler.release(src_id)
+
     @cinder_utils.retry(exceptions=const.VNXTargetNotReadyError,
                         interval=15,
                         retries=5, backoff_rate=1)
-    def migrate_lun(self, src_id, dst_id,
-                    rate=const.MIGRATION_RATE_HIGH):
+    def _start_migration(self, src_id, dst_id, rate):
         src = self.vnx.get_lun(lun_id=src_id)
         src.migrate(dst_id, rate)
 
+    def get_migration_sessions(self):
+        return self.vnx.get_migration_session()
+
     def session_finished(self, src_lun):
         session = self.vnx.get_migration_session(src_lun)
         if not session.existed:
@@ -213,20 +286,57 @@ class Client(object):
         else:
             return False
 
-    def verify_migration(self, src_id, dst_id, dst_wwn):
+    def _sync_session_finished(self, src_lun, progress,
+                               progress_callback=None):
+        session = self.vnx.get_migration_session(src_lun)
+        if not session.existed:
+            return True
+        elif session.current_state in migration.SESSION_FAILED_STATES:
+            LOG.warning(_LW('Session is %s, need to handled then.'),
+                        session.current_state)
+            return True
+        progress.update(session)
+        if progress.should_log():
+            eta = progress.get_eta()
+            LOG.info(_LI('Migration %(src)s -> %(dst)s is %(percent)s%% '
+                         'complete, %(eta)s seconds remaining.'),
+                     {'src': progress.src_id, 'dst': progress.dst_id,
+                      'percent': progress.percent_complete,
+                      'eta': int(eta) if eta is not None else 'unknown'})
+        if progress_callback:
+            try:
+                progress_callback(progress.to_dict())
+            except Exception as ex:
+                LOG.warning(_LW('Failed to record the progress of migration '
+                                '%(src)s: %(ex)s.'),
+                            {'src': progress.src_id, 'ex': ex})
+        return False
+
+    def verify_migration(self, src_id, dst_id, dst_wwn,
+                         progress_callback=None):
         """Verify whether migration session finished successfully.
 
         :param src_id:  source LUN id
         :param dst_id:  destination LUN id
         :param dst_wwn: destination LUN WWN
+        :param progress_callback: called with the progress of the migration
+                                  each time it is polled.
         :returns Boolean: True or False
         """
         src_lun = self.vnx.get_lun(lun_id=src_id)
-        # Sleep 30 seconds to make sure the session starts On the VNX.
-        time.sleep(30)
-        utils.wait_until(condition=self.session_finished,
-                         interval=common.INTERVAL_30_SEC,
-                         src_lun=src_lun)
+        progress = migration.MigrationProgress(src_id, dst_id)
+        self.sync_migrations[src_id] = progress
+        try:
+            # Sleep 30 seconds to make sure the session starts On the VNX.
+            time.sleep(30)
+            utils.wait_until(condition=self._sync_session_finished,
+                             interval=common.INTERVAL_30_SEC,
+                             src_lun=src_lun, progress=progress,
+                             progress_callback=progress_callback)
+        finally:
+            self.sync_migrations.pop(src_id, None)
+            if self.migration_scheduler:
+                self.migration_scheduler.release(src_id)
         new_lun = self.vnx.get_lun(lun_id=dst_id)
         new_wwn = new_lun.wwn
         if not new_wwn or new_wwn != dst_wwn:
@@ -362,6 +472,35 @@ class Client(object):
     def get_serial(self):
         return self.vnx.serial
 
+    def get_admission_stats(self):
+        """Returns the CLI admission metrics per SP, if limited."""
+        return self.admission.get_stats() if self.admission else {}
+
+    def get_running_migrations(self):
+        if self.migration_scheduler:
+            return sum(self.migration_scheduler.get_stats()[
+                'running'].values())
+        return 0
+
+    def get_migration_stats(self):
+        stats = {}
+        if self.migration_scheduler:
+            stats = self.migration_scheduler.get_stats()
+        if self.sync_migrations:
+            stats['sync_progress'] = [
+                progress.to_dict()
+                for progress in list(self.sync_migrations.values())]
+        return stats or None
+
+    def get_sp_stats(self):
+        """Returns the latency, error rate and breaker per SP, if routed."""
+        if not self.sp_tracker:
+            return {}
+        stats = self.sp_tracker.get_stats()
+        for sp_ip, state in self.sp_breakers.get_stats().items():
+            stats.setdefault(sp_ip, {})['breaker'] = state
+        return stats
+
     def get_pools(self):
         return self.vnx.get_pool()
 
@@ -554,6 +693,8 @@ class Client(object):
         return self.vnx.get_cg(name=name)
 
     def get_available_ip(self):
+        if self.sp_tracker:
+            return self.vnx.best_sp()
         return self.vnx.alive_sp_ip
 
     def get_mirror(self, mirror_name):
@@ -18,15 +18,14 @@ VNX Common Utils
 
 from oslo_config import cfg
 from oslo_log import log as logging
-from oslo_utils import importutils
-
-storops = importutils.try_import('storops')
 
 from cinder import exception
 from cinder.i18n import _, _LW
-from cinder.volume.drivers.emc.vnx import const
+from cinder.volume.drivers.emc.vnx import lazy
 from cinder.volume import volume_types
 
+storops = lazy.try_import('storops')
+
 CONF = cfg.CONF
 
 LOG = logging.getLogger(__name__)
@@ -101,6 +100,115 @@ EMC_VNX_OPTS = [
                 default=False,
                 help='Force LUN creation even if '
                 'the full threshold of pool is reached. '
+                'By default, the value is False.'),
+    cfg.StrOpt('storops_call_log',
+               help='Path of an append-only file to which every storops '
+               'call, with its arguments, result summary and duration, is '
+               'recorded for offline performance analysis. '
+               'By default, no call is recorded.'),
+    cfg.IntOpt('max_cli_calls_per_sp',
+               default=0,
+               help='Maximum number of CLI calls issued concurrently to '
+               'one storage processor. Further calls wait in a read '
+               'or a write lane, reads being served first. '
+               'By default, the value is 0, which means no limit.'),
+    cfg.StrOpt('storage_vnx_secondary_sp_ip',
+               help='IP address of the other storage processor of the VNX '
+               'system, san_ip being the primary one. When it is set, '
+               'read-only queries are sent to the healthy storage '
+               'processor which answers fastest.'),
+    cfg.FloatOpt('sp_hedge_threshold',
+                 default=10.0,
+                 help='Seconds after which a read-only query still pending on '
+                 'one storage processor is issued to the other one as well. '
+                 'It only applies when storage_vnx_secondary_sp_ip is set. '
+                 'Set it to 0 to disable hedging. '
+                 'By default, the value is 10.'),
+    cfg.IntOpt('sp_breaker_failure_threshold',
+               default=3,
+               help='Number of consecutive calls failing to reach a storage '
+               'processor after which calls are sent to its peer until a '
+               'background probe finds it reachable again. It only '
+               'applies when storage_vnx_secondary_sp_ip is set. '
+               'By default, the value is 3.'),
+    cfg.IntOpt('sp_breaker_probe_interval',
+               default=INTERVAL_30_SEC,
+               help='Seconds between two probes of an unreachable storage '
+               'processor. By default, the value is 30.'),
+    cfg.ListOpt('warm_lun_pool_sizes',
+                default=None,
+                help='Comma-separated list of sizes in GiB of the LUNs '
+                'created ahead of time in each storage pool. '
+                'create_volume renames a pre-created LUN of the same size, '
+                'or expands a smaller one, instead of creating a new LUN. '
+                'By default, no LUN is created ahead of time.'),
+    cfg.IntOpt('warm_lun_pool_low_watermark',
+               default=1,
+               help='The pre-created LUNs of a size, pool, provision and '
+               'tier are refilled when fewer than this number are left. '
+               'By default, the value is 1.'),
+    cfg.IntOpt('warm_lun_pool_high_watermark',
+               default=2,
+               help='Number of pre-created LUNs of a size, pool, provision '
+               'and tier after a refill. By default, the value is 2.'),
+    cfg.IntOpt('warm_lun_pool_refill_interval',
+               default=INTERVAL_60_SEC,
+               help='Seconds between two checks of the pre-created LUNs '
+               'and snap mount points. By default, the value is 60.'),
+    cfg.IntOpt('warm_smp_pool_size',
+               default=0,
+               help='Number of snap mount points created ahead of time for '
+               'each LUN which is cloned often with snapcopy. The clones '
+               'rename a pre-created snap mount point instead of creating '
+               'one. By default, the value is 0, which disables it.'),
+    cfg.IntOpt('warm_smp_pool_min_clones',
+               default=3,
+               help='Number of snapcopy clones of a LUN after which its '
+               'snap mount points are created ahead of time. '
+               'By default, the value is 3.'),
+    cfg.IntOpt('bulk_clone_max_migrations',
+               default=4,
+               help='Maximum number of LUN migrations started or running '
+               'at the same time for one bulk clone. '
+               'By default, the value is 4.'),
+    cfg.IntOpt('max_migrations_per_sp',
+               default=0,
+               help='Maximum number of LUN migrations running at the same '
+               'time on each storage processor. The other migrations wait '
+               'in a queue, where the migrations a user waits for go '
+               'first. By default, the value is 0, which means unlimited.'),
+    cfg.IntOpt('migration_rate_small_volume_size',
+               default=10,
+               help='Size in GiB up to which the migrations a user waits '
+               'for run as soon as possible. The larger ones run at high '
+               'rate. It does not apply to the volumes with the '
+               'migrate_rate metadata. By default, the value is 10.'),
+    cfg.IntOpt('migration_rate_large_volume_size',
+               default=1024,
+               help='Size in GiB from which the async migrations run at low '
+               'rate. The smaller ones run at medium rate. By default, the '
+               'value is 1024.'),
+    cfg.StrOpt('migration_rate_off_peak_hours',
+               default=None,
+               help='Off-peak window in local hours, like 22-6, during which '
+               'the async migrations run one rate step higher. '
+               'By default, there is no off-peak window.'),
+    cfg.IntOpt('migration_rate_busy_threshold',
+               default=0,
+               help='Number of running migrations from which the async '
+               'migrations run one rate step lower. It only applies when '
+               'max_migrations_per_sp is set. By default, the value is 0, '
+               'which disables it.'),
+    cfg.IntOpt('async_migration_poll_interval',
+               default=INTERVAL_60_SEC,
+               help='Seconds between two checks of the async migrations of '
+               'the cloned volumes. The temporary snapshot of a clone is '
+               'deleted once its migration is completed. By default, the '
+               'value is 60.'),
+    cfg.BoolOpt('migration_progress_in_admin_metadata',
+                default=False,
+                help='Store the progress of the sync migrations in the admin '
+                'metadata of the volumes, while the driver waits for them. '
                 'By default, the value is False.')
 ]
 
@@ -116,7 +224,9 @@ class ExtraSpecs(object):
     _tier_key = 'storagetype:tiering'
     _replication_key = 'replication_enabled'
 
-    PROVISION_DEFAULT = const.PROVISION_THICK
+    # None stands for thick, which is resolved on first use so that
+    # storops is not imported along with the options.
+    PROVISION_DEFAULT = None
     TIER_DEFAULT = None
 
     def __init__(self, extra_specs):
@@ -128,9 +238,9 @@ class ExtraSpecs(object):
         self.apply_default_values()
 
     def apply_default_values(self):
-        self.provision = (ExtraSpecs.PROVISION_DEFAULT
-                          if self.provision is None
-                          else self.provision)
+        if self.provision is None:
+            self.provision = (ExtraSpecs.PROVISION_DEFAULT or
+                              storops.VNXProvisionEnum.THICK)
         # Can not set Tier when provision is set to deduped. So don't set the
         # tier default when provision is deduped.
         if self.provision != storops.VNXProvisionEnum.DEDUPED:
@@ -18,11 +18,13 @@ from oslo_log import log as logging
 
 from cinder import interface
 from cinder.volume import driver
-from cinder.volume.drivers.emc.vnx import adapter
 from cinder.volume.drivers.emc.vnx import common
+from cinder.volume.drivers.emc.vnx import lazy
 from cinder.volume.drivers.emc.vnx import utils
 from cinder.zonemanager import utils as zm_utils
 
+# The adapter pulls in storops and taskflow, which only cinder-volume needs.
+adapter = lazy.LazyModule('cinder.volume.drivers.emc.vnx.adapter')
 
 LOG = logging.getLogger(__name__)
 
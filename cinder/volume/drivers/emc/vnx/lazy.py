@@ -0,0 +1,73 @@
+# Copyright (c) 2016 EMC Corporation, Inc.
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+"""
+VNX lazy imports
+
+Every cinder service loads the driver modules, while only cinder-volume
+uses storops, taskflow and the adapter. The modules on the light import
+path (`driver`, `common` and `utils`) reference them through `LazyModule`
+so that they are only imported on first use.
+"""
+
+import importlib
+import threading
+
+
+class LazyModule(object):
+    """Module imported on first attribute access.
+
+    :param name: full name of the module.
+    :param optional: if True, a missing module makes the instance false
+                     instead of raising ImportError, like
+                     `oslo_utils.importutils.try_import`.
+    """
+
+    def __init__(self, name, optional=False):
+        self.__dict__.update(_name=name, _optional=optional, _loaded=False,
+                             _module=None, _lock=threading.Lock())
+
+    def _load(self):
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    try:
+                        self.__dict__['_module'] = importlib.import_module(
+                            self._name)
+                    except ImportError:
+                        if not self._optional:
+                            raise
+                    self.__dict__['_loaded'] = True
+        return self._module
+
+    def __getattr__(self, name):
+        module = self._load()
+        if module is None:
+            raise AttributeError('%(attr)s: module %(module)s is not '
+                                 'installed.' % {'attr': name,
+                                                 'module': self._name})
+        return getattr(module, name)
+
+    def __bool__(self):
+        return self._load() is not None
+
+    __nonzero__ = __bool__
+
+    def __repr__(self):
+        return '<lazy module %s>' % self._name
+
+
+def try_import(name):
+    """Lazy counterpart of `oslo_utils.importutils.try_import`."""
+    return LazyModule(name, optional=True)
@@ -0,0 +1,172 @@
+# Copyright (c) 2016 EMC Corporation, Inc.
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+"""
+VNX CLI admission control
+
+Naviseccli sessions against one storage processor (SP) slow down sharply
+when too many of them run at the same time. `AdmissionController` bounds
+the number of in-flight storops calls per SP. Waiting calls are served from
+two lanes: reads (queries) are admitted first because they are short and
+usually on the attach path, while writes keep making progress because at
+most `READ_BURST` reads are admitted in a row when writes are waiting.
+"""
+
+import collections
+import threading
+import time
+
+from oslo_log import log as logging
+
+from cinder.i18n import _LW
+from cinder.volume.drivers.emc.vnx import proxy
+
+LOG = logging.getLogger(__name__)
+
+LANE_READ = 'read'
+LANE_WRITE = 'write'
+LANES = (LANE_READ, LANE_WRITE)
+
+# Number of reads admitted in a row before a waiting write is admitted.
+READ_BURST = 4
+
+# Queue wait which is worth a warning, in seconds.
+SLOW_WAIT = 30
+
+
+class LaneStats(object):
+    """Queue-wait metrics of one lane of one SP."""
+
+    def __init__(self):
+        self.admitted = 0
+        self.waited = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record(self, wait):
+        self.admitted += 1
+        if wait > 0:
+            self.waited += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+
+    def to_dict(self):
+        return {'admitted': self.admitted,
+                'waited': self.waited,
+                'avg_wait': (round(self.total_wait / self.admitted, 3)
+                             if self.admitted else 0.0),
+                'max_wait': round(self.max_wait, 3)}
+
+
+class _SPSlots(object):
+    """In-flight counter and waiting lanes of one SP."""
+
+    def __init__(self, max_inflight):
+        self.max_inflight = max_inflight
+        self.inflight = 0
+        self.waiting = {lane: collections.deque() for lane in LANES}
+        self.stats = {lane: LaneStats() for lane in LANES}
+        self.read_streak = 0
+
+    def next_lane(self):
+        reads, writes = (self.waiting[LANE_READ], self.waiting[LANE_WRITE])
+        if reads and (not writes or self.read_streak < READ_BURST):
+            return LANE_READ
+        if writes:
+            return LANE_WRITE
+        return None
+
+
+class AdmissionController(proxy.Interceptor):
+    """Bounds the number of in-flight storops calls per SP.
+
+    :param max_inflight: maximum number of concurrent calls per SP. A value
+                         lower than 1 disables the limit.
+    :param sp_of: callable which takes a `proxy.StoropsCall` and returns the
+                  SP which serves it.
+    """
+
+    def __init__(self, max_inflight, sp_of):
+        self.max_inflight = max_inflight
+        self.sp_of = sp_of
+        self._lock = threading.Lock()
+        self._sps = {}
+
+    def _slots(self, sp):
+        slots = self._sps.get(sp)
+        if slots is None:
+            slots = self._sps[sp] = _SPSlots(self.max_inflight)
+        return slots
+
+    def acquire(self, sp, lane):
+        """Waits until a call on `lane` may run against `sp`.
+
+        Returns the time spent waiting, in seconds.
+        """
+        start = time.time()
+        with self._lock:
+            slots = self._slots(sp)
+            if (slots.inflight < slots.max_inflight and
+                    not any(slots.waiting.values())):
+                self._admit(slots, lane, 0.0)
+                return 0.0
+            ticket = threading.Event()
+            slots.waiting[lane].append(ticket)
+        ticket.wait()
+        wait = time.time() - start
+        with self._lock:
+            slots.stats[lane].record(wait)
+        if wait > SLOW_WAIT:
+            LOG.warning(_LW('A storops %(lane)s call waited %(wait).1f '
+                            'seconds for a CLI slot on SP %(sp)s.'),
+                        {'lane': lane, 'wait': wait, 'sp': sp})
+        return wait
+
+    def _admit(self, slots, lane, wait):
+        slots.inflight += 1
+        slots.read_streak = slots.read_streak + 1 if lane == LANE_READ else 0
+        if wait is not None:
+            slots.stats[lane].record(wait)
+
+    def release(self, sp):
+        with self._lock:
+            slots = self._slots(sp)
+            slots.inflight -= 1
+            while slots.inflight < slots.max_inflight:
+                lane = slots.next_lane()
+                if lane is None:
+                    break
+                # Wait time is recorded by the admitted thread itself.
+                self._admit(slots, lane, None)
+                slots.waiting[lane].popleft().set()
+
+    def intercept(self, invoke, call, args, kwargs):
+        if self.max_inflight < 1:
+            return invoke(*args, **kwargs)
+        sp = self.sp_of(call)
+        self.acquire(sp, LANE_READ if call.is_read else LANE_WRITE)
+        try:
+            return invoke(*args, **kwargs)
+        finally:
+            self.release(sp)
+
+    def get_stats(self):
+        """Returns the in-flight count and lane metrics of each SP."""
+        with self._lock:
+            return {sp: {'max_inflight': slots.max_inflight,
+                         'inflight': slots.inflight,
+                         'lanes': {lane: dict(slots.stats[lane].to_dict(),
+                                              queued=len(slots.waiting[lane]))
+                                   for lane in LANES}}
+                    for sp, slots in self._sps.items()}
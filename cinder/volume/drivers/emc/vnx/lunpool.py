@@ -0,0 +1,379 @@
+# Copyright (c) 2016 EMC Corporation, Inc.
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+"""
+VNX warm LUN and SMP pools
+
+Creating a LUN and waiting until it is IO ready is the slowest part of
+`create_volume`. The warm LUN pool keeps a few IO ready LUNs per storage
+pool, size bucket, provision and tier, and `create_volume` claims one of
+them by renaming it, expanding it first when only a smaller bucket is
+available.
+
+The warm SMP pool keeps detached snap mount points of the base LUNs which
+are cloned often, so the snapcopy flows rename one instead of creating it.
+
+The attributes of a warm object are encoded in its name, so the inventory
+is rebuilt from the array after a restart. The pools are refilled in the
+background.
+"""
+
+import collections
+import threading
+import uuid
+
+from oslo_log import log as logging
+from oslo_service import loopingcall
+from oslo_utils import importutils
+
+storops = importutils.try_import('storops')
+
+from cinder.i18n import _LE, _LI, _LW
+
+LOG = logging.getLogger(__name__)
+
+WARM_LUN_PREFIX = 'warm-'
+WARM_SMP_PREFIX = 'warm-smp-'
+NO_TIER = 'default'
+
+LunKey = collections.namedtuple('LunKey', 'pool size provision tier')
+
+
+def build_warm_name(key):
+    return '%(prefix)s%(size)s-%(provision)s-%(tier)s-%(id)s' % {
+        'prefix': WARM_LUN_PREFIX,
+        'size': key.size,
+        'provision': key.provision.value,
+        'tier': key.tier.value if key.tier is not None else NO_TIER,
+        'id': uuid.uuid4().hex[:8]}
+
+
+def parse_warm_name(name, pool):
+    """Returns the `LunKey` of a warm LUN, or None for other LUNs."""
+    if not name or not name.startswith(WARM_LUN_PREFIX):
+        return None
+    try:
+        size, provision, tier, __ = name[len(WARM_LUN_PREFIX):].split('-')
+        return LunKey(pool, int(size),
+                      storops.VNXProvisionEnum.parse(provision),
+                      (None if tier == NO_TIER
+                       else storops.VNXTieringEnum.parse(tier)))
+    except ValueError:
+        return None
+
+
+def build_warm_smp_name(base_lun_id):
+    return '%(prefix)s%(base)s-%(id)s' % {'prefix': WARM_SMP_PREFIX,
+                                          'base': base_lun_id,
+                                          'id': uuid.uuid4().hex[:8]}
+
+
+def parse_warm_smp_name(name):
+    """Returns the base LUN ID of a warm SMP, or None for other LUNs."""
+    if not name or not name.startswith(WARM_SMP_PREFIX):
+        return None
+    try:
+        return int(name[len(WARM_SMP_PREFIX):].split('-')[0])
+    except ValueError:
+        return None
+
+
+class WarmPool(object):
+    """Base of the pools refilled in the background."""
+
+    kind = None
+
+    def __init__(self, client):
+        self.client = client
+        self.hits = 0
+        self.misses = 0
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._timer = None
+
+    def start(self, interval):
+        self._timer = loopingcall.FixedIntervalLoopingCall(self.refill)
+        self._timer.start(interval=interval)
+
+    def stop(self):
+        if self._timer:
+            self._timer.stop()
+            self._timer = None
+
+    def load(self):
+        raise NotImplementedError()
+
+    def _refill(self):
+        raise NotImplementedError()
+
+    def refill(self):
+        try:
+            if not self._loaded:
+                self.load()
+                self._loaded = True
+            self._refill()
+        except Exception:
+            LOG.exception(_LE('Failed to refill the warm %s pool.'),
+                          self.kind)
+
+    def _discard(self, warm_name):
+        try:
+            self.client.delete_lun(warm_name)
+        except Exception as ex:
+            LOG.warning(_LW('Failed to delete warm %(kind)s %(warm)s: '
+                            '%(ex)s.'),
+                        {'kind': self.kind, 'warm': warm_name, 'ex': ex})
+
+    def _get_claim_stats(self):
+        claims = self.hits + self.misses
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': (float(self.hits) / claims if claims
+                             else None)}
+
+
+class WarmLunPool(WarmPool):
+    """Pre-created LUNs ready to be claimed by `create_volume`.
+
+    :param client: `client.Client` of the backend.
+    :param sizes: size buckets in GiB.
+    :param low_watermark: a key is refilled when it has fewer LUNs.
+    :param high_watermark: number of LUNs of a key after a refill.
+    :param ignore_thresholds: passed to `Client.create_lun`.
+    """
+
+    kind = 'LUN'
+
+    def __init__(self, client, sizes, low_watermark, high_watermark,
+                 ignore_thresholds=False):
+        super(WarmLunPool, self).__init__(client)
+        self.sizes = sorted(set(sizes))
+        self.low_watermark = low_watermark
+        self.high_watermark = high_watermark
+        self.ignore_thresholds = ignore_thresholds
+        self.expanded = 0
+        self._luns = collections.defaultdict(list)
+        self._keys = set()
+
+    def add_target(self, pool, provision, tier):
+        """Keeps LUNs of all the size buckets ready for the given specs."""
+        with self._lock:
+            self._add_target(pool, provision, tier)
+
+    def _add_target(self, pool, provision, tier):
+        for size in self.sizes:
+            self._keys.add(LunKey(pool, size, provision, tier))
+
+    def load(self):
+        """Rebuilds the inventory from the warm LUNs on the array."""
+        found = collections.defaultdict(list)
+        for lun in self.client.get_luns():
+            key = parse_warm_name(lun.name, lun.pool_name)
+            if key is not None and key.size in self.sizes:
+                found[key].append(lun.name)
+        with self._lock:
+            for key, names in found.items():
+                self._luns[key].extend(
+                    name for name in names if name not in self._luns[key])
+        LOG.info(_LI('Found %d warm LUNs on the array.'),
+                 sum(len(names) for names in found.values()))
+
+    def _refill(self):
+        with self._lock:
+            deficits = [(key, self.high_watermark - len(self._luns[key]))
+                        for key in self._keys
+                        if len(self._luns[key]) < self.low_watermark]
+        for key, deficit in deficits:
+            for __ in range(deficit):
+                self._create(key)
+
+    def _create(self, key):
+        name = build_warm_name(key)
+        self.client.create_lun(key.pool, name, key.size, key.provision,
+                               key.tier,
+                               ignore_thresholds=self.ignore_thresholds)
+        with self._lock:
+            self._luns[key].append(name)
+        LOG.debug('Created warm LUN %s.', name)
+
+    def _take(self, pool, size, provision, tier):
+        # Prefer the exact size, then the largest smaller bucket, which
+        # needs the smallest expansion.
+        for bucket in reversed([s for s in self.sizes if s <= size]):
+            names = self._luns.get(LunKey(pool, bucket, provision, tier))
+            if names:
+                return bucket, names.pop(0)
+        return None, None
+
+    def claim(self, pool, name, size, provision, tier):
+        """Renames a warm LUN to `name`.
+
+        Returns the claimed LUN, or None if no warm LUN matches, in which
+        case the caller creates the LUN as usual.
+        """
+        with self._lock:
+            # The specs of the volumes seen are kept warm from now on.
+            self._add_target(pool, provision, tier)
+            bucket, warm_name = self._take(pool, size, provision, tier)
+            if warm_name is None:
+                self.misses += 1
+                return None
+        try:
+            if bucket < size:
+                self.client.expand_lun(warm_name, size)
+            lun = self.client.rename_lun(warm_name, name)
+        except Exception as ex:
+            LOG.warning(_LW('Failed to claim warm LUN %(warm)s for '
+                            '%(name)s, creating a new LUN instead: %(ex)s.'),
+                        {'warm': warm_name, 'name': name, 'ex': ex})
+            self._discard(warm_name)
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+            if bucket < size:
+                self.expanded += 1
+        LOG.info(_LI('Claimed warm LUN %(warm)s for %(name)s.'),
+                 {'warm': warm_name, 'name': name})
+        return lun
+
+    def get_stats(self):
+        with self._lock:
+            stats = self._get_claim_stats()
+            stats['expanded'] = self.expanded
+            stats['available'] = {
+                '%s/%s/%s/%s' % (key.pool, key.size, key.provision.value,
+                                 key.tier.value if key.tier is not None
+                                 else NO_TIER): len(names)
+                for key, names in self._luns.items()}
+            return stats
+
+
+class WarmSmpPool(WarmPool):
+    """Detached SMPs of the base LUNs which are cloned often.
+
+    :param client: `client.Client` of the backend.
+    :param size: number of SMPs kept ready for each hot base LUN.
+    :param min_clones: a base LUN is hot after this number of snapcopy
+                       clones.
+    """
+
+    kind = 'SMP'
+
+    def __init__(self, client, size, min_clones):
+        super(WarmSmpPool, self).__init__(client)
+        self.size = size
+        self.min_clones = min_clones
+        self._clones = collections.Counter()
+        self._smps = collections.defaultdict(list)
+        self._base_ids = {}
+
+    def load(self):
+        """Rebuilds the inventory from the warm SMPs on the array."""
+        found = collections.defaultdict(list)
+        for lun in self.client.get_luns():
+            base_id = parse_warm_smp_name(lun.name)
+            if base_id is not None:
+                found[base_id].append(lun.name)
+        for base_id, names in found.items():
+            try:
+                base_name = self.client.get_lun(lun_id=base_id).name
+            except Exception:
+                base_name = None
+            if not base_name:
+                for name in names:
+                    self._discard(name)
+                continue
+            with self._lock:
+                self._base_ids[base_name] = base_id
+                self._clones[base_name] = max(self._clones[base_name],
+                                              self.min_clones)
+                self._smps[base_name].extend(
+                    name for name in names
+                    if name not in self._smps[base_name])
+        LOG.info(_LI('Found %d warm SMPs on the array.'),
+                 sum(len(names) for names in found.values()))
+
+    def _refill(self):
+        with self._lock:
+            deficits = [(base, self.size - len(self._smps[base]))
+                        for base, clones in self._clones.items()
+                        if clones >= self.min_clones and
+                        len(self._smps[base]) < self.size]
+        for base, deficit in deficits:
+            try:
+                for __ in range(deficit):
+                    self._create(base)
+            except Exception as ex:
+                LOG.warning(_LW('Failed to create warm SMPs of %(base)s, '
+                                'which is not cloned from the pool any '
+                                'more: %(ex)s.'), {'base': base, 'ex': ex})
+                self.release(base)
+
+    def _create(self, base):
+        base_id = self._base_ids.get(base)
+        if base_id is None:
+            base_id = self.client.get_lun(name=base).lun_id
+            self._base_ids[base] = base_id
+        name = build_warm_smp_name(base_id)
+        self.client.create_mount_point(base, name)
+        with self._lock:
+            self._smps[base].append(name)
+        LOG.debug('Created warm SMP %(name)s of %(base)s.',
+                  {'name': name, 'base': base})
+
+    def claim(self, base_lun_name, smp_name):
+        """Renames a warm SMP of `base_lun_name` to `smp_name`.
+
+        Returns the claimed SMP, or None if no warm SMP is ready.
+        """
+        with self._lock:
+            self._clones[base_lun_name] += 1
+            names = self._smps.get(base_lun_name)
+            if not names:
+                self.misses += 1
+                return None
+            warm_name = names.pop(0)
+        try:
+            lun = self.client.rename_lun(warm_name, smp_name)
+        except Exception as ex:
+            LOG.warning(_LW('Failed to claim warm SMP %(warm)s for '
+                            '%(name)s, creating a new SMP instead: %(ex)s.'),
+                        {'warm': warm_name, 'name': smp_name, 'ex': ex})
+            self._discard(warm_name)
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        LOG.debug('Claimed warm SMP %(warm)s for %(name)s.',
+                  {'warm': warm_name, 'name': smp_name})
+        return lun
+
+    def release(self, base_lun_name):
+        """Deletes the warm SMPs of a base LUN which is being deleted."""
+        with self._lock:
+            self._clones.pop(base_lun_name, None)
+            self._base_ids.pop(base_lun_name, None)
+            names = self._smps.pop(base_lun_name, [])
+        for name in names:
+            self._discard(name)
+
+    def get_stats(self):
+        with self._lock:
+            stats = self._get_claim_stats()
+            stats['available'] = {base: len(names)
+                                  for base, names in self._smps.items()}
+            return stats
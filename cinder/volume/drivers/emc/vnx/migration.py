@@ -0,0 +1,450 @@
+# Copyright (c) 2016 EMC Corporation, Inc.
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+"""
+VNX LUN migration scheduler
+
+The array runs a limited number of LUN migrations at a time. Starting more
+makes them queue on the array or fail with `VNXTargetNotReadyError`. The
+`MigrationScheduler` keeps at most `max_per_sp` migrations running per SP
+and queues the others, starting the waiting sync migrations, which a user
+waits for, before the async and background ones.
+
+A sync migration holds its slot until `Client.verify_migration` returns.
+The slots of the other migrations are released by a background poll of
+their sessions.
+
+`MigrationRatePolicy` picks the rate of the migrations which do not have
+one in the volume metadata.
+
+`MigrationProgress` records how far a sync migration has gone while the
+driver waits for it, and estimates when it finishes.
+
+`MigrationTracker` follows the async migrations of the clones until they
+finish, and deletes their temporary snapshots right away. The tracked
+migrations are saved to `TRACKER_FILE` under the state directory of the
+backend, so they are followed again after a restart.
+"""
+
+import collections
+import heapq
+import itertools
+import json
+import os
+import threading
+import time
+
+from oslo_log import log as logging
+from oslo_service import loopingcall
+from oslo_utils import importutils
+
+storops = importutils.try_import('storops')
+
+from cinder.i18n import _LE, _LI, _LW
+from cinder.volume.drivers.emc.vnx import common
+
+LOG = logging.getLogger(__name__)
+
+PRIORITY_SYNC = 0
+PRIORITY_ASYNC = 1
+PRIORITY_BACKGROUND = 2
+PRIORITY_NAMES = {PRIORITY_SYNC: 'sync',
+                  PRIORITY_ASYNC: 'async',
+                  PRIORITY_BACKGROUND: 'background'}
+
+# Number of the latest waits the wait time stats are computed from.
+WAIT_WINDOW = 100
+
+TRACKER_FILE = 'migrations.json'
+# Seconds between two progress logs of a sync migration.
+PROGRESS_LOG_INTERVAL = 300
+SESSION_FAILED_STATES = ('FAULTED', 'STOPPED')
+
+
+class MigrationScheduler(object):
+    """Admits LUN migrations under a per-SP limit, by priority.
+
+    :param max_per_sp: maximum number of migrations running per SP.
+    :param is_finished: callable taking the source LUN ID, which tells
+                        whether its migration session is over.
+    :param poll_interval: seconds between two polls of the sessions of the
+                          async and background migrations.
+    """
+
+    def __init__(self, max_per_sp, is_finished,
+                 poll_interval=common.INTERVAL_30_SEC):
+        self.max_per_sp = max_per_sp
+        self.is_finished = is_finished
+        self.poll_interval = poll_interval
+        self.started = 0
+        self._cond = threading.Condition()
+        self._waiting = []
+        self._running = {}
+        self._counts = collections.Counter()
+        self._seq = itertools.count()
+        self._waits = collections.deque(maxlen=WAIT_WINDOW)
+        self._timer = None
+
+    def _is_next(self, entry):
+        priority, seq, sp = entry
+        if self._counts[sp] >= self.max_per_sp:
+            return False
+        return entry == min(e for e in self._waiting if e[2] == sp)
+
+    def acquire(self, src_id, sp, priority=PRIORITY_SYNC):
+        """Waits until the migration of `src_id` may start on `sp`."""
+        queued_at = time.time()
+        entry = (priority, next(self._seq), sp)
+        with self._cond:
+            heapq.heappush(self._waiting, entry)
+            while not self._is_next(entry):
+                self._cond.wait()
+            self._waiting.remove(entry)
+            heapq.heapify(self._waiting)
+            self._counts[sp] += 1
+            self._running[src_id] = (sp, priority)
+            self.started += 1
+            self._waits.append(time.time() - queued_at)
+            # A waiter of another SP may be next now.
+            self._cond.notify_all()
+            if priority != PRIORITY_SYNC and self._timer is None:
+                self._start_poll()
+
+    def release(self, src_id):
+        """Frees the slot of the migration of `src_id`, if any."""
+        with self._cond:
+            found = self._running.pop(src_id, None)
+            if found is None:
+                return
+            self._counts[found[0]] -= 1
+            self._cond.notify_all()
+
+    def _start_poll(self):
+        self._timer = loopingcall.FixedIntervalLoopingCall(self.poll)
+        self._timer.start(interval=self.poll_interval,
+                          initial_delay=self.poll_interval)
+
+    def poll(self):
+        """Releases the slots of the finished async migrations."""
+        with self._cond:
+            watched = [src_id for src_id, (sp, priority)
+                       in self._running.items()
+                       if priority != PRIORITY_SYNC]
+        for src_id in watched:
+            try:
+                if self.is_finished(src_id):
+                    self.release(src_id)
+            except Exception:
+                LOG.exception(_LE('Failed to poll the migration session of '
+                                  'LUN %s.'), src_id)
+        with self._cond:
+            if not any(priority != PRIORITY_SYNC
+                       for sp, priority in self._running.values()):
+                self._timer = None
+                raise loopingcall.LoopingCallDone()
+
+    def get_stats(self):
+        with self._cond:
+            queued = collections.Counter(
+                PRIORITY_NAMES[priority]
+                for priority, seq, sp in self._waiting)
+            waits = list(self._waits)
+            return {'max_per_sp': self.max_per_sp,
+                    'running': {sp: count for sp, count
+                                in self._counts.items() if count},
+                    'queued': len(self._waiting),
+                    'queued_by_priority': dict(queued),
+                    'started': self.started,
+                    'avg_wait': (sum(waits) / len(waits) if waits
+                                 else None),
+                    'max_wait': max(waits) if waits else None}
+
+
+def parse_hours(window):
+    """Parses a window of hours like `22-6` to a tuple of two hours."""
+    start, end = (int(hour) for hour in window.split('-'))
+    if not (0 <= start < 24 and 0 <= end < 24) or start == end:
+        raise ValueError(window)
+    return start, end
+
+
+class MigrationRatePolicy(object):
+    """Picks the migration rate from the size and the mode of a migration.
+
+    A sync migration keeps a user waiting, so it runs at high rate, or as
+    soon as possible for a small LUN. An async migration runs at medium
+    rate, or at low rate for a large LUN, to leave room for the IO of the
+    tenants. The rate of an async migration is one step higher during the
+    off-peak hours and one step lower while the array is busy migrating.
+
+    :param small_size: size in GiB up to which a sync migration is run as
+                       soon as possible.
+    :param large_size: size in GiB from which an async migration runs at
+                       low rate.
+    :param off_peak_hours: tuple of the first and the last (excluded) hours
+                           of the off-peak window, or None.
+    :param busy_threshold: number of running migrations from which the
+                           array is busy. 0 disables it.
+    :param load: callable returning the number of running migrations.
+    """
+
+    def __init__(self, small_size, large_size, off_peak_hours=None,
+                 busy_threshold=0, load=None):
+        self.small_size = small_size
+        self.large_size = large_size
+        self.off_peak_hours = off_peak_hours
+        self.busy_threshold = busy_threshold
+        self.load = load
+
+    def is_off_peak(self, hour=None):
+        if not self.off_peak_hours:
+            return False
+        if hour is None:
+            hour = time.localtime().tm_hour
+        start, end = self.off_peak_hours
+        if start < end:
+            return start <= hour < end
+        return hour >= start or hour < end
+
+    def is_busy(self):
+        return bool(self.busy_threshold and self.load and
+                    self.load() >= self.busy_threshold)
+
+    def select(self, size, async_migrate):
+        rates = [storops.VNXMigrationRate.LOW,
+                 storops.VNXMigrationRate.MEDIUM,
+                 storops.VNXMigrationRate.HIGH,
+                 storops.VNXMigrationRate.ASAP]
+        if not async_migrate:
+            return rates[3] if size <= self.small_size else rates[2]
+        step = 0 if size >= self.large_size else 1
+        if self.is_off_peak():
+            step += 1
+        if self.is_busy():
+            step -= 1
+        return rates[max(step, 0)]
+
+
+class MigrationProgress(object):
+    """Progress of a sync migration, read from its session.
+
+    :param src_id: ID of the source LUN.
+    :param dst_id: ID of the destination LUN.
+    """
+
+    def __init__(self, src_id, dst_id):
+        self.src_id = src_id
+        self.dst_id = dst_id
+        self.started_at = time.time()
+        self.updated_at = None
+        self.state = None
+        self.percent_complete = None
+        self.time_remaining = None
+        self._logged_at = self.started_at
+
+    def update(self, session):
+        self.updated_at = time.time()
+        self.state = session.current_state
+        self.percent_complete = session.percent_complete
+        self.time_remaining = session.time_remaining
+
+    def get_throughput(self):
+        """Returns the percents migrated per hour so far, or None."""
+        if not self.percent_complete or not self.updated_at:
+            return None
+        elapsed = self.updated_at - self.started_at
+        if elapsed <= 0:
+            return None
+        return float(self.percent_complete) * 3600 / elapsed
+
+    def get_eta(self):
+        """Returns the seconds until the migration finishes, or None.
+
+        The estimate comes from the throughput so far, as the time
+        remaining of the session is not reported in a fixed format.
+        """
+        throughput = self.get_throughput()
+        if not throughput:
+            return None
+        return (100 - float(self.percent_complete)) * 3600 / throughput
+
+    def should_log(self, interval=PROGRESS_LOG_INTERVAL):
+        now = time.time()
+        if now - self._logged_at >= interval:
+            self._logged_at = now
+            return True
+        return False
+
+    def to_dict(self):
+        return {'src_id': self.src_id,
+                'dst_id': self.dst_id,
+                'state': self.state,
+                'percent_complete': self.percent_complete,
+                'time_remaining': self.time_remaining,
+                'eta': self.get_eta(),
+                'throughput': self.get_throughput(),
+                'elapsed': time.time() - self.started_at}
+
+
+class MigrationTracker(object):
+    """Follows the async migrations until their sessions finish.
+
+    All the tracked migrations are polled with one listing of the
+    migration sessions of the array.
+
+    :param client: `client.Client` of the backend.
+    :param state_dir: state directory of the backend.
+    :param interval: seconds between two polls.
+    """
+
+    def __init__(self, client, state_dir, interval=common.INTERVAL_60_SEC):
+        self.client = client
+        self.path = os.path.join(state_dir, TRACKER_FILE)
+        self.interval = interval
+        self.completed = 0
+        self.faulted = 0
+        self._migrations = {}
+        self._lock = threading.Lock()
+        self._timer = None
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                self._migrations = json.load(f)
+        except (IOError, OSError, ValueError) as ex:
+            LOG.warning(_LW('Failed to load the migrations tracked in '
+                            '%(path)s: %(ex)s.'), {'path': self.path,
+                                                   'ex': ex})
+
+    def _save(self):
+        tmp_path = self.path + '.tmp'
+        try:
+            state_dir = os.path.dirname(self.path)
+            if not os.path.isdir(state_dir):
+                os.makedirs(state_dir)
+            with open(tmp_path, 'w') as f:
+                json.dump(self._migrations, f)
+            os.rename(tmp_path, self.path)
+        except (IOError, OSError) as ex:
+            LOG.warning(_LW('Failed to save the tracked migrations to '
+                            '%(path)s: %(ex)s.'), {'path': self.path,
+                                                   'ex': ex})
+
+    def start(self):
+        """Starts polling if there are migrations to follow."""
+        with self._lock:
+            if self._migrations and self._timer is None:
+                self._timer = loopingcall.FixedIntervalLoopingCall(self.poll)
+                self._timer.start(interval=self.interval,
+                                  initial_delay=self.interval)
+
+    def track(self, volume_id, src_id, snap_name=None):
+        """Follows the migration of a volume.
+
+        :param volume_id: ID of the volume.
+        :param src_id: ID of the source LUN of the migration, which becomes
+                       the LUN of the volume.
+        :param snap_name: temporary snapshot deleted once the migration is
+                          over. It may be shared by several migrations.
+        """
+        with self._lock:
+            self._migrations[volume_id] = {'src_id': src_id,
+                                           'snap_name': snap_name,
+                                           'started_at': time.time(),
+                                           'state': None,
+                                           'percent_complete': None,
+                                           'time_remaining': None}
+            self._save()
+        self.start()
+
+    def forget(self, volume_id):
+        with self._lock:
+            if self._migrations.pop(volume_id, None) is not None:
+                self._save()
+
+    def is_tracked(self, volume_id):
+        with self._lock:
+            return volume_id in self._migrations
+
+    def poll(self):
+        with self._lock:
+            tracked = dict(self._migrations)
+        if tracked:
+            try:
+                sessions = {session.source_lu_id: session for session
+                            in self.client.get_migration_sessions()}
+            except Exception:
+                LOG.exception(_LE('Failed to list the migration sessions.'))
+                return
+            for volume_id, item in tracked.items():
+                session = sessions.get(item['src_id'])
+                if session is None:
+                    self._finish(volume_id, item)
+                elif session.current_state in SESSION_FAILED_STATES:
+                    LOG.error(_LE('Migration of volume %(volume)s is '
+                                  '%(state)s.'),
+                              {'volume': volume_id,
+                               'state': session.current_state})
+                    self.faulted += 1
+                    self.forget(volume_id)
+                else:
+                    with self._lock:
+                        if volume_id in self._migrations:
+                            self._migrations[volume_id].update(
+                                state=session.current_state,
+                                percent_complete=session.percent_complete,
+                                time_remaining=session.time_remaining)
+            with self._lock:
+                self._save()
+        with self._lock:
+            if not self._migrations:
+                self._timer = None
+                raise loopingcall.LoopingCallDone()
+
+    def _finish(self, volume_id, item):
+        with self._lock:
+            if self._migrations.pop(volume_id, None) is None:
+                return
+            self.completed += 1
+            snap_name = item['snap_name']
+            snap_in_use = any(other['snap_name'] == snap_name
+                              for other in self._migrations.values())
+        LOG.info(_LI('Migration of volume %s is completed.'), volume_id)
+        if snap_name and not snap_in_use:
+            try:
+                self.client.delete_snapshot(snap_name)
+            except Exception as ex:
+                LOG.warning(_LW('Failed to delete the temporary snapshot '
+                                '%(snap)s, which expires later: %(ex)s.'),
+                            {'snap': snap_name, 'ex': ex})
+
+    def get_progress(self, volume_id):
+        with self._lock:
+            item = self._migrations.get(volume_id)
+            return dict(item) if item else None
+
+    def get_stats(self):
+        with self._lock:
+            return {'tracked': len(self._migrations),
+                    'completed': self.completed,
+                    'faulted': self.faulted,
+                    'volumes': {
+                        volume_id: {'percent_complete':
+                                    item['percent_complete'],
+                                    'time_remaining': item['time_remaining'],
+                                    'started_at': item['started_at']}
+                        for volume_id, item in self._migrations.items()}}
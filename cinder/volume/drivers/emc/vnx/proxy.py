@@ -0,0 +1,215 @@
+# Copyright (c) 2016 EMC Corporation, Inc.
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+"""
+VNX storops call interception
+
+`StoropsProxy` wraps the storops system object used by `client.Client`.
+Every method call, attribute read and attribute write on the wrapped
+object, and on the storops objects it returns, is passed through a chain
+of `Interceptor` instances before it reaches storops.
+"""
+
+import six
+
+
+# Methods which only toggle client-side state of storops resources and
+# never issue a CLI command.
+PASSTHROUGH_METHODS = ('with_poll', 'with_no_poll')
+
+# Prefixes of storops method names which only query the array.
+READ_PREFIXES = ('get_', 'is_', 'update', 'has_')
+
+KIND_CALL = 'call'
+KIND_GET = 'get'
+KIND_SET = 'set'
+
+
+class StoropsCall(object):
+    """Describes one operation on a storops object."""
+
+    def __init__(self, owner, name, kind=KIND_CALL, sp=None):
+        self.owner = owner
+        self.name = name
+        self.kind = kind
+        # IP of the storage processor serving the call, if it is pinned.
+        self.sp = sp
+
+    @property
+    def full_name(self):
+        return '%s.%s' % (self.owner, self.name)
+
+    @property
+    def is_read(self):
+        if self.kind == KIND_GET:
+            return True
+        if self.kind == KIND_SET:
+            return False
+        return self.name.startswith(READ_PREFIXES)
+
+    def __repr__(self):
+        return '<%s %s>' % (self.kind, self.full_name)
+
+
+class Interceptor(object):
+    """Base class of the hooks invoked around storops operations."""
+
+    def intercept(self, invoke, call, args, kwargs):
+        """Runs the storops operation.
+
+        :param invoke: callable which performs the operation, or hands it
+                       over to the next interceptor in the chain.
+        :param call: `StoropsCall` describing the operation.
+        :param args: positional arguments of the operation.
+        :param kwargs: keyword arguments of the operation.
+        """
+        return invoke(*args, **kwargs)
+
+
+class InterceptorChain(Interceptor):
+    """Runs several interceptors, the first one being the outermost."""
+
+    def __init__(self, interceptors=None):
+        self.interceptors = list(interceptors or [])
+
+    def append(self, interceptor):
+        self.interceptors.append(interceptor)
+
+    def intercept(self, invoke, call, args, kwargs):
+        for interceptor in reversed(self.interceptors):
+            invoke = _bind(interceptor, invoke, call)
+        return invoke(*args, **kwargs)
+
+    def __len__(self):
+        return len(self.interceptors)
+
+
+def _bind(interceptor, invoke, call):
+    def _invoke(*args, **kwargs):
+        return interceptor.intercept(invoke, call, args, kwargs)
+    return _invoke
+
+
+def is_storops_object(obj):
+    return type(obj).__module__.split('.')[0] == 'storops'
+
+
+def unwrap(obj):
+    """Returns the raw storops object behind `obj`."""
+    if isinstance(obj, StoropsProxy):
+        return object.__getattribute__(obj, '_target')
+    elif isinstance(obj, (list, tuple)):
+        return type(obj)(unwrap(item) for item in obj)
+    return obj
+
+
+def wrap(obj, interceptor, sp=None):
+    """Wraps `obj` with the interceptor if it is a storops object."""
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(wrap(item, interceptor, sp) for item in obj)
+    if isinstance(obj, StoropsProxy) or not is_storops_object(obj):
+        return obj
+    return StoropsProxy(obj, interceptor, sp)
+
+
+class StoropsProxy(object):
+    """Transparent wrapper of a storops object.
+
+    Arguments are unwrapped before being handed to storops, so storops
+    never sees a proxy. Storops objects in the results are wrapped, so the
+    operations on them are intercepted as well.
+
+    :param sp: IP of the storage processor `target` talks to, when the
+               caller pinned it. It is passed on to the calls and to the
+               wrapped results.
+    """
+
+    def __init__(self, target, interceptor, sp=None):
+        object.__setattr__(self, '_target', target)
+        object.__setattr__(self, '_interceptor', interceptor)
+        object.__setattr__(self, '_sp', sp)
+
+    def _run(self, call, func, args, kwargs):
+        interceptor = object.__getattribute__(self, '_interceptor')
+        result = interceptor.intercept(func, call, unwrap(args),
+                                       {k: unwrap(v)
+                                        for k, v in kwargs.items()})
+        return wrap(result, interceptor, object.__getattribute__(self, '_sp'))
+
+    def __getattr__(self, name):
+        target = object.__getattribute__(self, '_target')
+        owner = type(target).__name__
+        sp = object.__getattribute__(self, '_sp')
+        if name.startswith('_'):
+            return getattr(target, name)
+        class_attr = getattr(type(target), name, None)
+        if not callable(class_attr) or isinstance(class_attr, property):
+            # Properties of storops resources may fetch data from the array
+            # on first access, so they are intercepted as well.
+            return self._run(StoropsCall(owner, name, KIND_GET, sp),
+                             lambda: getattr(target, name), (), {})
+
+        value = getattr(target, name)
+        if name in PASSTHROUGH_METHODS:
+            return value
+
+        call = StoropsCall(owner, name, sp=sp)
+
+        @six.wraps(value)
+        def _method(*args, **kwargs):
+            return self._run(call, value, args, kwargs)
+        return _method
+
+    def __setattr__(self, name, value):
+        target = object.__getattribute__(self, '_target')
+        call = StoropsCall(type(target).__name__, name, KIND_SET,
+                           object.__getattribute__(self, '_sp'))
+        self._run(call, lambda v: setattr(target, name, v), (value,), {})
+
+    def __iter__(self):
+        interceptor = object.__getattribute__(self, '_interceptor')
+        sp = object.__getattribute__(self, '_sp')
+        for item in object.__getattribute__(self, '_target'):
+            yield wrap(item, interceptor, sp)
+
+    def __len__(self):
+        return len(object.__getattribute__(self, '_target'))
+
+    def __getitem__(self, item):
+        return wrap(object.__getattribute__(self, '_target')[item],
+                    object.__getattribute__(self, '_interceptor'),
+                    object.__getattribute__(self, '_sp'))
+
+    def __contains__(self, item):
+        return unwrap(item) in object.__getattribute__(self, '_target')
+
+    def __eq__(self, other):
+        return object.__getattribute__(self, '_target') == unwrap(other)
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        return hash(object.__getattribute__(self, '_target'))
+
+    def __bool__(self):
+        return bool(object.__getattribute__(self, '_target'))
+
+    __nonzero__ = __bool__
+
+    def __repr__(self):
+        return repr(object.__getattribute__(self, '_target'))
+
+    def __str__(self):
+        return str(object.__getattribute__(self, '_target'))
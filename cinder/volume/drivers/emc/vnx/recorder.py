@@ -0,0 +1,248 @@
+# Copyright (c) 2016 EMC Corporation, Inc.
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+"""
+VNX storops call recorder and replayer
+
+`CallRecorder` appends one JSON line per storops operation to a log file:
+
+    {"t": 1478012345.12, "k": "call", "n": "VNXSystem.get_lun",
+     "a": [], "kw": {"name": "volume-1"}, "r": {"type": "VNXLun"},
+     "d": 0.004}
+
+Keys: `t` start time, `k` kind (call, get or set), `n` owner type and
+operation name, `a`/`kw` summarized arguments, `r` summarized result,
+`e`/`m` exception class name and message when the operation failed, `d`
+duration in seconds.
+
+`ReplaySystem` is a fake VNX system built from such a log. It returns the
+recorded results, raises the recorded exceptions and sleeps the recorded
+durations, so that a recorded session can be fed into the driver offline.
+"""
+
+import collections
+import enum
+import json
+import threading
+import time
+
+from oslo_log import log as logging
+from oslo_utils import importutils
+import six
+
+storops = importutils.try_import('storops')
+if storops:
+    from storops import exception as storops_ex
+
+from cinder import exception
+from cinder.i18n import _, _LI
+from cinder.volume.drivers.emc.vnx import proxy
+
+LOG = logging.getLogger(__name__)
+
+ROOT_TYPE = 'VNXSystem'
+
+
+class ReplayMismatchException(exception.VolumeDriverException):
+    """Raised when the driver issues an operation not in the replay log."""
+    pass
+
+
+def summarize(value):
+    """Converts a value to a JSON friendly summary.
+
+    Storops resources are summarized by their type only, because reading
+    their properties may issue CLI commands.
+    """
+    if value is None or isinstance(value, (bool, float) + six.integer_types +
+                                   six.string_types):
+        return value
+    elif isinstance(value, enum.Enum):
+        return {'enum': type(value).__name__, 'value': value.value}
+    elif isinstance(value, (list, tuple)):
+        return [summarize(item) for item in value]
+    elif isinstance(value, dict):
+        return {six.text_type(k): summarize(v) for k, v in value.items()}
+    return {'type': type(proxy.unwrap(value)).__name__}
+
+
+class CallRecorder(proxy.Interceptor):
+    """Records each storops operation to an append-only log file."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = None
+
+    def intercept(self, invoke, call, args, kwargs):
+        start = time.time()
+        try:
+            result = invoke(*args, **kwargs)
+        except Exception as ex:
+            self.record(call, args, kwargs, start, error=ex)
+            raise
+        self.record(call, args, kwargs, start, result=result)
+        return result
+
+    def record(self, call, args, kwargs, start, result=None, error=None):
+        entry = {'t': round(start, 3),
+                 'k': call.kind,
+                 'n': call.full_name,
+                 'd': round(time.time() - start, 4)}
+        if args:
+            entry['a'] = summarize(args)
+        if kwargs:
+            entry['kw'] = summarize(kwargs)
+        if error is not None:
+            entry['e'] = type(error).__name__
+            entry['m'] = six.text_type(error)
+        else:
+            entry['r'] = summarize(result)
+        line = json.dumps(entry, separators=(',', ':'), sort_keys=True)
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, 'a')
+                LOG.info(_LI('Recording storops calls to %s.'), self.path)
+            self._file.write(line + '\n')
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def load_log(path):
+    """Loads the entries of a storops call log."""
+    entries = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                entries.append(json.loads(line))
+    return entries
+
+
+class ReplaySystem(object):
+    """Fake VNX system which answers from a storops call log.
+
+    Recorded entries are consumed in order per operation name, so the
+    replayed driver code may interleave operations differently from the
+    recorded session, as long as each operation sees the same sequence.
+
+    :param entries: the entries returned by `load_log`.
+    :param honour_latency: sleep the recorded duration of each operation.
+    """
+
+    def __init__(self, entries, honour_latency=True):
+        self._honour_latency = honour_latency
+        self._lock = threading.Lock()
+        self._pending = collections.defaultdict(collections.deque)
+        for entry in entries:
+            self._pending[(entry['k'], entry['n'])].append(entry)
+        self._root = ReplayObject(self, ROOT_TYPE)
+
+    @classmethod
+    def from_file(cls, path, honour_latency=True):
+        return cls(load_log(path), honour_latency=honour_latency)
+
+    @property
+    def root(self):
+        return self._root
+
+    def has_next(self, kind, full_name):
+        return bool(self._pending.get((kind, full_name)))
+
+    def remaining(self):
+        """Returns the number of recorded entries not replayed yet."""
+        return sum(len(queue) for queue in self._pending.values())
+
+    def replay(self, kind, full_name):
+        with self._lock:
+            queue = self._pending.get((kind, full_name))
+            if not queue:
+                msg = (_('No recorded %(kind)s of %(name)s left to replay.')
+                       % {'kind': kind, 'name': full_name})
+                raise ReplayMismatchException(msg)
+            entry = queue.popleft()
+        if self._honour_latency and entry.get('d'):
+            time.sleep(entry['d'])
+        if 'e' in entry:
+            ex_class = getattr(storops_ex, entry['e'], None)
+            if ex_class is None:
+                ex_class = storops_ex.VNXException
+            raise ex_class(entry.get('m'))
+        return self.materialize(entry.get('r'))
+
+    def materialize(self, summary):
+        if isinstance(summary, list):
+            return [self.materialize(item) for item in summary]
+        elif isinstance(summary, dict):
+            if 'type' in summary:
+                return ReplayObject(self, summary['type'])
+            elif 'enum' in summary:
+                enum_class = getattr(storops, summary['enum'], None)
+                return (enum_class(summary['value']) if enum_class
+                        else summary['value'])
+            return {k: self.materialize(v) for k, v in summary.items()}
+        return summary
+
+
+class ReplayObject(object):
+    """Fake storops object of a `ReplaySystem`."""
+
+    def __init__(self, system, type_name):
+        self.__dict__['_system'] = system
+        self.__dict__['_type_name'] = type_name
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        full_name = '%s.%s' % (self._type_name, name)
+        if self._system.has_next(proxy.KIND_GET, full_name):
+            return self._system.replay(proxy.KIND_GET, full_name)
+        if name in proxy.PASSTHROUGH_METHODS:
+            return _NoopContext
+
+        def _method(*args, **kwargs):
+            return self._system.replay(proxy.KIND_CALL, full_name)
+        return _method
+
+    def __setattr__(self, name, value):
+        full_name = '%s.%s' % (self._type_name, name)
+        self._system.replay(proxy.KIND_SET, full_name)
+
+    def __repr__(self):
+        return '<Replay %s>' % self._type_name
+
+
+class _NoopContext(object):
+    def __enter__(self):
+        pass
+
+    def __exit__(self, exc_type, exc_value, exc_tb):
+        pass
+
+
+def replay(client, path, honour_latency=True):
+    """Makes `client` replay the storops call log at `path`.
+
+    Returns the `ReplaySystem`, whose `remaining` tells how much of the
+    recorded session was not exercised by the replayed driver code.
+    """
+    system = ReplaySystem.from_file(path, honour_latency=honour_latency)
+    client.vnx = system.root
+    LOG.info(_LI('Client now replays storops calls from %s.'), path)
+    return system
@@ -0,0 +1,239 @@
+# Copyright (c) 2016 EMC Corporation, Inc.
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+"""
+VNX storage processor routing
+
+When both SP IPs of the array are known, `client.Client` holds one storops
+system per SP. `LatencyTracker` keeps a moving average of the latency and
+of the error rate of the calls served by each SP, and `SPRouter` sends the
+read-only queries to the healthy SP which answers fastest. A query which
+takes longer than the hedge threshold is issued again to the other SP, and
+the first answer wins. Writes go to the primary SP, unless its circuit
+breaker is open.
+"""
+
+import threading
+import time
+
+from oslo_log import log as logging
+from six.moves import queue
+
+from cinder.volume.drivers.emc.vnx import proxy
+
+LOG = logging.getLogger(__name__)
+
+# Weight of the latest sample in the moving averages.
+EWMA_WEIGHT = 0.2
+
+# SPs whose moving error rate is above this value are unhealthy.
+ERROR_RATE_THRESHOLD = 0.5
+
+# An SP which served nothing for this many seconds is probed again, so
+# that it gets a chance to recover from a bad reputation.
+STALE_AFTER = 60
+
+
+class SPHealth(object):
+    """Moving averages of the calls served by one SP."""
+
+    def __init__(self):
+        self.latency = 0.0
+        self.error_rate = 0.0
+        self.calls = 0
+        self.errors = 0
+        self.hedged = 0
+        self.updated_at = None
+
+    def record(self, latency, failed):
+        if self.calls == 0:
+            self.latency = latency
+            self.error_rate = 1.0 if failed else 0.0
+        else:
+            self.latency += EWMA_WEIGHT * (latency - self.latency)
+            self.error_rate += EWMA_WEIGHT * ((1.0 if failed else 0.0) -
+                                              self.error_rate)
+        self.calls += 1
+        if failed:
+            self.errors += 1
+        self.updated_at = time.time()
+
+    @property
+    def healthy(self):
+        return self.error_rate <= ERROR_RATE_THRESHOLD
+
+    def is_stale(self):
+        return (self.updated_at is None or
+                time.time() - self.updated_at > STALE_AFTER)
+
+    def to_dict(self):
+        return {'latency': round(self.latency, 3),
+                'error_rate': round(self.error_rate, 3),
+                'healthy': self.healthy,
+                'calls': self.calls,
+                'errors': self.errors,
+                'hedged': self.hedged}
+
+
+class LatencyTracker(proxy.Interceptor):
+    """Measures the calls served by each SP."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sps = {}
+
+    def health(self, sp):
+        with self._lock:
+            return self._sps.setdefault(sp, SPHealth())
+
+    def intercept(self, invoke, call, args, kwargs):
+        if call.sp is None:
+            return invoke(*args, **kwargs)
+        start = time.time()
+        try:
+            result = invoke(*args, **kwargs)
+        except Exception:
+            self.record(call.sp, time.time() - start, True)
+            raise
+        self.record(call.sp, time.time() - start, False)
+        return result
+
+    def record(self, sp, latency, failed):
+        health = self.health(sp)
+        with self._lock:
+            health.record(latency, failed)
+
+    def rank(self, sps):
+        """Sorts `sps` from the preferred SP to the least preferred one.
+
+        Healthy SPs come first, the fastest first. Stale SPs are ranked as
+        healthy and idle so that they are probed again.
+        """
+        def _key(sp):
+            health = self.health(sp)
+            if health.is_stale():
+                return (False, 0.0)
+            return (not health.healthy, health.latency)
+        return sorted(sps, key=_key)
+
+    def get_stats(self):
+        with self._lock:
+            return {sp: health.to_dict() for sp, health in self._sps.items()}
+
+
+class SPRouter(proxy.StoropsProxy):
+    """Storops system which routes read-only queries to the best SP.
+
+    :param systems: ordered dict of the storops systems keyed by SP IP, the
+                    first one being the primary SP.
+    :param interceptor: interceptor of the calls, which must include
+                        `tracker`.
+    :param tracker: `LatencyTracker` measuring the SPs.
+    :param hedge_after: seconds after which a pending query is issued to
+                        the next SP as well. A value of 0 disables hedging.
+    :param board: `breaker.BreakerBoard` of the SPs, which must be part of
+                  `interceptor` as well.
+    """
+
+    def __init__(self, systems, interceptor, tracker, hedge_after=0,
+                 board=None):
+        primary_sp = next(iter(systems))
+        super(SPRouter, self).__init__(systems[primary_sp], interceptor,
+                                       primary_sp)
+        object.__setattr__(self, '_sps', list(systems))
+        object.__setattr__(self, '_systems',
+                           {sp: proxy.StoropsProxy(system, interceptor, sp)
+                            for sp, system in systems.items()})
+        object.__setattr__(self, '_tracker', tracker)
+        object.__setattr__(self, '_hedge_after', hedge_after)
+        object.__setattr__(self, '_board', board)
+
+    def _available_sps(self):
+        """Returns the SPs to use, the primary one first."""
+        sps = object.__getattribute__(self, '_sps')
+        board = object.__getattribute__(self, '_board')
+        return board.available(sps) if board else sps
+
+    def best_sp(self):
+        """Returns the IP of the preferred SP."""
+        tracker = object.__getattribute__(self, '_tracker')
+        return tracker.rank(self._available_sps())[0]
+
+    def __getattr__(self, name):
+        target = object.__getattribute__(self, '_target')
+        class_attr = getattr(type(target), name, None)
+        is_property = (not callable(class_attr) or
+                       isinstance(class_attr, property))
+        kind = proxy.KIND_GET if is_property else proxy.KIND_CALL
+        if name.startswith('_') or name in proxy.PASSTHROUGH_METHODS:
+            return super(SPRouter, self).__getattr__(name)
+        if not proxy.StoropsCall(type(target).__name__, name, kind).is_read:
+            write_sp = self._available_sps()[0]
+            if write_sp == object.__getattribute__(self, '_sp'):
+                return super(SPRouter, self).__getattr__(name)
+            return getattr(object.__getattribute__(self, '_systems')[write_sp],
+                           name)
+
+        if is_property:
+            return self._route(lambda system: getattr(system, name))
+
+        def _method(*args, **kwargs):
+            return self._route(
+                lambda system: getattr(system, name)(*args, **kwargs))
+        return _method
+
+    def _route(self, func):
+        systems = object.__getattribute__(self, '_systems')
+        tracker = object.__getattribute__(self, '_tracker')
+        hedge_after = object.__getattribute__(self, '_hedge_after')
+        order = tracker.rank(self._available_sps())
+        if hedge_after <= 0:
+            return func(systems[order[0]])
+
+        results = queue.Queue()
+
+        def _attempt(sp):
+            try:
+                results.put((True, func(systems[sp])))
+            except Exception as ex:
+                results.put((False, ex))
+
+        def _launch(sp):
+            thread = threading.Thread(target=_attempt, args=(sp,))
+            thread.daemon = True
+            thread.start()
+
+        _launch(order[0])
+        launched = pending = 1
+        error = None
+        while True:
+            try:
+                succeeded, value = results.get(
+                    timeout=hedge_after if launched < len(order) else None)
+            except queue.Empty:
+                LOG.debug('Query is slower than %(after)s seconds on SP '
+                          '%(sp)s, hedging it on SP %(peer)s.',
+                          {'after': hedge_after, 'sp': order[launched - 1],
+                           'peer': order[launched]})
+                tracker.health(order[launched]).hedged += 1
+                _launch(order[launched])
+                launched += 1
+                pending += 1
+                continue
+            pending -= 1
+            if succeeded:
+                return value
+            error = error or value
+            if pending == 0:
+                raise error
@@ -13,6 +13,9 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import functools
+import threading
+
 from oslo_log import log as logging
 from oslo_utils import importutils
 
@@ -26,11 +29,14 @@ from taskflow.types import failure
 from cinder import exception
 from cinder.volume.drivers.emc.vnx import common
 from cinder.volume.drivers.emc.vnx import const
+from cinder.volume.drivers.emc.vnx import migration
 from cinder.volume.drivers.emc.vnx import utils
 from cinder.i18n import _, _LI, _LW
 
 LOG = logging.getLogger(__name__)
 
+BULK_CLONE_WORKERS = 16
+
 
 class MigrateLunTask(task.Task):
     """Starts a migration between two LUNs/SMPs.
@@ -44,19 +50,33 @@ class MigrateLunTask(task.Task):
                                              inject=inject,
                                              rebind=rebind)
 
-    def execute(self, client, src_id, dst_id, async_migrate, *args, **kwargs):
+    def execute(self, client, src_id, dst_id, async_migrate,
+                migration_slots=None, rate=None, progress_callback=None,
+                *args, **kwargs):
         LOG.debug('%s.execute', self.__class__.__name__)
         dst_lun = client.get_lun(lun_id=dst_id)
         dst_wwn = dst_lun.wwn
-        client.migrate_lun(src_id, dst_id)
-        if not async_migrate:
-            migrated = client.verify_migration(src_id, dst_id, dst_wwn)
-            if not migrated:
-                msg = _("Failed to migrate volume between source vol %(src)s"
-                        " and dest vol %(dst)s.") % {
-                            'src': src_id, 'dst': dst_id}
-                LOG.error(msg)
-                raise exception.VolumeBackendAPIException(data=msg)
+        if migration_slots:
+            migration_slots.acquire()
+        try:
+            client.migrate_lun(src_id, dst_id,
+                               rate=rate or const.MIGRATION_RATE_HIGH,
+                               priority=(migration.PRIORITY_ASYNC
+                                         if async_migrate
+                                         else migration.PRIORITY_SYNC))
+            if not async_migrate:
+                migrated = client.verify_migration(
+                    src_id, dst_id, dst_wwn,
+                    progress_callback=progress_callback)
+                if not migrated:
+                    msg = _("Failed to migrate volume between source vol "
+                            "%(src)s and dest vol %(dst)s.") % {
+                                'src': src_id, 'dst': dst_id}
+                    LOG.error(msg)
+                    raise exception.VolumeBackendAPIException(data=msg)
+        finally:
+            if migration_slots:
+                migration_slots.release()
 
     def revert(self, result, client, src_id, dst_id, *args, **kwargs):
         method_name = '%s.revert' % self.__class__.__name__
@@ -136,12 +156,14 @@ class CreateSMPTask(task.Task):
                                             provides=provides,
                                             inject=inject)
 
-    def execute(self, client, smp_name, base_lun_name,
+    def execute(self, client, smp_name, base_lun_name, smp_pool=None,
                 *args, **kwargs):
         LOG.debug('%s.execute', self.__class__.__name__)
 
-        client.create_mount_point(base_lun_name, smp_name)
-        lun = client.get_lun(name=smp_name)
+        lun = smp_pool.claim(base_lun_name, smp_name) if smp_pool else None
+        if lun is None:
+            client.create_mount_point(base_lun_name, smp_name)
+            lun = client.get_lun(name=smp_name)
         return lun.lun_id
 
     def revert(self, result, client, smp_name, *args, **kwargs):
@@ -345,7 +367,8 @@ def run_migration_taskflow(client,
                            pool_name,
                            provision,
                            tier,
-                           rate=const.MIGRATION_RATE_HIGH):
+                           rate=const.MIGRATION_RATE_HIGH,
+                           progress_callback=None):
     # Step 1: create target LUN
     # Step 2: start and migrate migration session
     tmp_lun_name = utils.construct_tmp_lun_name(lun_name)
@@ -359,6 +382,8 @@ def run_migration_taskflow(client,
                   'ignore_thresholds': True,
                   'src_id': lun_id,
                   'async_migrate': False,
+                  'rate': rate,
+                  'progress_callback': progress_callback,
                   }
     work_flow = linear_flow.Flow(flow_name)
     work_flow.add(CreateLunTask(),
@@ -373,7 +398,8 @@ def fast_create_volume_from_snapshot(client,
                                      new_snap_name,
                                      lun_name,
                                      base_lun_name,
-                                     pool_name):
+                                     pool_name,
+                                     smp_pool=None):
     # Step 1: copy snapshot
     # Step 2: allow read/write for snapshot
     # Step 3: create smp LUN
@@ -387,6 +413,7 @@ def fast_create_volume_from_snapshot(client,
                   'smp_name': lun_name,
                   'base_lun_name': base_lun_name,
                   'ignore_thresholds': True,
+                  'smp_pool': smp_pool,
                   }
     work_flow = linear_flow.Flow(flow_name)
     work_flow.add(CopySnapshotTask(),
@@ -402,7 +429,8 @@ def fast_create_volume_from_snapshot(client,
 
 def create_volume_from_snapshot(client, src_snap_name, lun_name,
                                 lun_size, base_lun_name, pool_name,
-                                provision, tier, new_snap_name=None):
+                                provision, tier, new_snap_name=None,
+                                rate=None, progress_callback=None):
     # Step 1: Copy and modify snap(only for async migrate)
     # Step 2: Create smp from base lun
     # Step 3: Attach snapshot to smp
@@ -423,6 +451,8 @@ def create_volume_from_snapshot(client, src_snap_name, lun_name,
                   'keep_for': (common.SNAP_EXPIRATION_HOUR
                                if new_snap_name else None),
                   'async_migrate': True if new_snap_name else False,
+                  'rate': rate,
+                  'progress_callback': progress_callback,
                   }
     work_flow = linear_flow.Flow(flow_name)
     if new_snap_name:
@@ -446,14 +476,15 @@ def create_volume_from_snapshot(client, src_snap_name, lun_name,
 
 
 def fast_create_cloned_volume(client, snap_name, lun_id,
-                              lun_name, base_lun_name):
+                              lun_name, base_lun_name, smp_pool=None):
     flow_name = 'create_cloned_snapcopy_volume'
     store_spec = {
         'client': client,
         'snap_name': snap_name,
         'lun_id': lun_id,
         'smp_name': lun_name,
-        'base_lun_name': base_lun_name}
+        'base_lun_name': base_lun_name,
+        'smp_pool': smp_pool}
     work_flow = linear_flow.Flow(flow_name)
     work_flow.add(CreateSnapshotTask(),
                   CreateSMPTask(),
@@ -466,7 +497,8 @@ def fast_create_cloned_volume(client, snap_name, lun_id,
 
 def create_cloned_volume(client, snap_name, lun_id, lun_name,
                          lun_size, base_lun_name, pool_name,
-                         provision, tier, async_migrate=False):
+                         provision, tier, async_migrate=False, rate=None,
+                         progress_callback=None):
     tmp_lun_name = '%s_dest' % lun_name
     flow_name = 'create_cloned_volume'
     store_spec = {'client': client,
@@ -482,6 +514,8 @@ def create_cloned_volume(client, snap_name, lun_id, lun_name,
                   'keep_for': (common.SNAP_EXPIRATION_HOUR if
                                async_migrate else None),
                   'async_migrate': async_migrate,
+                  'rate': rate,
+                  'progress_callback': progress_callback,
                   }
     work_flow = linear_flow.Flow(flow_name)
     work_flow.add(
@@ -501,6 +535,77 @@ def create_cloned_volume(client, snap_name, lun_id, lun_name,
     return lun_id
 
 
+def create_cloned_volumes(client, snap_name, lun_id, base_lun_name,
+                          clone_specs, max_migrations,
+                          max_workers=BULK_CLONE_WORKERS):
+    """Creates clones of one LUN from a single snapshot.
+
+    :param clone_specs: list of dicts with the `lun_name`, `lun_size`,
+                        `pool_name`, `provision`, `tier`, `async_migrate`
+                        and optional `rate` of each clone.
+    :param max_migrations: maximum number of migrations started or
+                           running at the same time.
+    :returns: tuple of the list of the LUN ID of each clone, None for the
+              failed ones, and the dict of the exceptions of the failed
+              clones, keyed by their index.
+    """
+    # Step 1: create the snapshot shared by all the clones
+    # Step 2: create the SMP and the LUN of each clone in parallel, and
+    #         migrate them under the migration limit
+    # Step 3: delete the snapshot once all the migrations are done
+    async_migrate = any(spec['async_migrate'] for spec in clone_specs)
+    flow_name = 'create_bulk_clone_snapshot'
+    store_spec = {'client': client,
+                  'snap_name': snap_name,
+                  'lun_id': lun_id,
+                  'keep_for': (common.SNAP_EXPIRATION_HOUR
+                               if async_migrate else None)}
+    work_flow = linear_flow.Flow(flow_name)
+    work_flow.add(CreateSnapshotTask())
+    taskflow.engines.load(work_flow, store=store_spec).run()
+
+    migration_slots = threading.Semaphore(max_migrations)
+
+    def _clone(spec):
+        flow_name = 'create_bulk_cloned_volume'
+        store_spec = {'client': client,
+                      'snap_name': snap_name,
+                      'smp_name': spec['lun_name'],
+                      'lun_name': '%s_dest' % spec['lun_name'],
+                      'lun_size': spec['lun_size'],
+                      'base_lun_name': base_lun_name,
+                      'pool_name': spec['pool_name'],
+                      'provision': spec['provision'],
+                      'tier': spec['tier'],
+                      'async_migrate': spec['async_migrate'],
+                      'rate': spec.get('rate'),
+                      'migration_slots': migration_slots}
+        work_flow = linear_flow.Flow(flow_name)
+        work_flow.add(
+            CreateSMPTask(),
+            AttachSnapTask(),
+            ExtendSMPTask(),
+            CreateLunTask(),
+            MigrateLunTask(
+                rebind={'src_id': 'smp_id', 'dst_id': 'new_lun_id'}))
+        engine = taskflow.engines.load(work_flow, store=store_spec)
+        engine.run()
+        return engine.storage.fetch('smp_id')
+
+    results, errors = utils.run_each_concurrently(
+        {i: functools.partial(_clone, spec)
+         for i, spec in enumerate(clone_specs)},
+        max_workers=max_workers)
+    if not async_migrate:
+        try:
+            client.delete_snapshot(snap_name)
+        except Exception as ex:
+            LOG.warning(_LW('Failed to delete the snapshot %(snap)s of the '
+                            'bulk clone: %(ex)s.'),
+                        {'snap': snap_name, 'ex': ex})
+    return [results.get(i) for i in range(len(clone_specs))], errors
+
+
 def create_cg_from_cg_snapshot(client, cg_name, src_cg_name,
                                cg_snap_name, src_cg_snap_name,
                                pool_name, lun_sizes, lun_names,
@@ -0,0 +1,118 @@
+# Copyright (c) 2016 EMC Corporation, Inc.
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+"""
+VNX array topology discovered at setup
+
+The topology (serial number, pools, target ports and enablers) of the
+array is saved to `TOPOLOGY_FILE` under the state directory of the backend
+after each discovery. On the next start, the adapter uses the saved
+topology right away and discovers the array again in the background.
+"""
+
+import json
+import os
+import time
+
+from oslo_log import log as logging
+
+from cinder.i18n import _LI, _LW
+
+LOG = logging.getLogger(__name__)
+
+TOPOLOGY_FILE = 'topology.json'
+FORMAT_VERSION = 1
+
+
+class Topology(object):
+    """Topology of the array.
+
+    `pools` and `ports` are the storops objects when the topology is just
+    discovered, and None when it is loaded from disk. `pool_names` and
+    `port_names` are always set.
+    """
+
+    def __init__(self, serial, pool_names, port_names, fast_enabled,
+                 mirror_view_enabled=None, pools=None, ports=None):
+        self.serial = serial
+        self.pool_names = pool_names
+        self.port_names = port_names
+        self.fast_enabled = fast_enabled
+        self.mirror_view_enabled = mirror_view_enabled
+        self.pools = pools
+        self.ports = ports
+
+    @property
+    def is_discovered(self):
+        return self.pools is not None
+
+    def to_dict(self):
+        return {'serial': self.serial,
+                'pools': self.pool_names,
+                'ports': self.port_names,
+                'fast_enabled': self.fast_enabled,
+                'mirror_view_enabled': self.mirror_view_enabled}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['serial'], data['pools'], data['ports'],
+                   data['fast_enabled'], data.get('mirror_view_enabled'))
+
+
+class TopologyCache(object):
+    """Saves and loads the topology of one backend.
+
+    :param state_dir: state directory of the backend.
+    :param key: dict of the options which the topology depends on. A saved
+                topology is ignored if it was saved with another key.
+    """
+
+    def __init__(self, state_dir, key):
+        self.path = os.path.join(state_dir, TOPOLOGY_FILE)
+        self.key = key
+
+    def load(self):
+        """Returns the saved `Topology`, or None if it is not usable."""
+        if not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            if (data.get('version') != FORMAT_VERSION or
+                    data.get('key') != self.key):
+                LOG.info(_LI('Ignoring the topology saved in %s, which was '
+                             'saved with another configuration.'), self.path)
+                return None
+            return Topology.from_dict(data['topology'])
+        except (IOError, OSError, ValueError, KeyError, TypeError) as ex:
+            LOG.warning(_LW('Failed to load the topology saved in %(path)s: '
+                            '%(ex)s.'), {'path': self.path, 'ex': ex})
+            return None
+
+    def save(self, topology):
+        data = {'version': FORMAT_VERSION,
+                'key': self.key,
+                'saved_at': time.time(),
+                'topology': topology.to_dict()}
+        tmp_path = self.path + '.tmp'
+        try:
+            state_dir = os.path.dirname(self.path)
+            if not os.path.isdir(state_dir):
+                os.makedirs(state_dir)
+            with open(tmp_path, 'w') as f:
+                json.dump(data, f)
+            os.rename(tmp_path, self.path)
+        except (IOError, OSError) as ex:
+            LOG.warning(_LW('Failed to save the topology to %(path)s: '
+                            '%(ex)s.'), {'path': self.path, 'ex': ex})
@@ -14,25 +14,27 @@
 # under the License.
 
 import six
+import sys
+import threading
 import time
 
 from oslo_log import log as logging
 from oslo_service import loopingcall
 from oslo_utils import excutils
-from oslo_utils import importutils
 from oslo_utils import uuidutils
 
-storops = importutils.try_import('storops')
-
 from cinder import exception
 from cinder.i18n import _, _LW
 from cinder.volume.drivers.emc.vnx import common
+from cinder.volume.drivers.emc.vnx import lazy
 from cinder.volume.drivers.san.san import san_opts
 from cinder.volume import utils as vol_utils
 from cinder.volume import volume_types
 
 LOG = logging.getLogger(__name__)
 
+storops = lazy.try_import('storops')
+
 
 def init_ops(configuration):
     configuration.append_config_values(common.EMC_VNX_OPTS)
@@ -138,6 +140,68 @@ def wait_until(condition, timeout=None, interval=common.INTERVAL_5_SEC,
     timer.start(interval=interval).wait()
 
 
+def run_concurrently(funcs):
+    """Runs callables concurrently and waits for all of them.
+
+    :param funcs: dict of callables without argument, keyed by name.
+    :returns: dict of the results keyed by the same names.
+    Re-raises the exception of the first failed callable, if any.
+    """
+    results = {}
+    errors = []
+
+    def _run(name, func):
+        try:
+            results[name] = func()
+        except Exception:
+            errors.append(sys.exc_info())
+
+    threads = [threading.Thread(target=_run, args=(name, func))
+               for name, func in funcs.items()]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        six.reraise(*errors[0])
+    return results
+
+
+def run_each_concurrently(funcs, max_workers=None):
+    """Runs callables concurrently, each one failing on its own.
+
+    :param funcs: dict of callables without argument, keyed by name.
+    :param max_workers: maximum number of callables running at the same
+                        time. Unlimited by default.
+    :returns: tuple of the dict of the results and the dict of the
+              exceptions of the failed callables, both keyed by name.
+    """
+    results = {}
+    errors = {}
+    pending = six.moves.queue.Queue()
+    for item in funcs.items():
+        pending.put(item)
+
+    def _work():
+        while True:
+            try:
+                name, func = pending.get_nowait()
+            except six.moves.queue.Empty:
+                return
+            try:
+                results[name] = func()
+            except Exception as ex:
+                errors[name] = ex
+
+    threads = [threading.Thread(target=_work)
+               for __ in range(min(len(funcs), max_workers or len(funcs)))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+
 def validate_storage_migration(volume, target_host, src_serial, src_protocol):
     if 'location_info' not in target_host['capabilities']:
         LOG.warning(_LW("Failed to get pool name and "
@@ -208,6 +272,12 @@ def construct_snap_name(volume):
         return 'tmp-snap-' + six.text_type(volume.name_id)
 
 
+def construct_bulk_snap_name(src_volume):
+    """Returns the name of the snapshot shared by a bulk clone."""
+    return 'tmp-snap-bulk-%(src)s-%(ts)s' % {'src': src_volume.name_id,
+                                             'ts': int(time.time())}
+
+
 def construct_mirror_name(volume):
     """Constructs MirrorView name for volume."""
     return 'mirror_' + six.text_type(volume.id)